@@ -0,0 +1,4 @@
+# -*- coding:utf-8 -*-
+'''
+:mod:'benchmarks' times the separation pipeline on synthetic data
+'''
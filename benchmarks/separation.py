@@ -0,0 +1,161 @@
+'''
+Benchmark the separation pipeline on synthetic spike trains.
+
+Every combination of sources (N), streams (C), seconds and spike density is
+built with :func:`data.generate_synthetic_data.spike_train` and
+:func:`data.generate_metadata.metadata`, then each stage of the pipeline is
+timed and its peak Python memory is measured with tracemalloc:
+
+    add_duration, trail, connectivity, carousel, position_slicer,
+    source_obj, connect_obj, frame (one steady-state radius + edge update)
+
+Run from the repository root:
+
+    python -m benchmarks.separation --N 100 400 --C 25 --seconds 5 20 --out bench.json
+'''
+
+import argparse
+import itertools
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from data.generate_synthetic_data import spike_train
+from data.generate_metadata import metadata
+from engram.declarative import ID
+from engram.episodic.edges import SparseEdges
+from engram.episodic import envs
+
+
+def measure(fn, repeat=3, setup=None):
+    '''
+    Time fn over repeat runs, then run it once more under tracemalloc for
+    its peak memory. setup is called before every run (e.g. to clear caches).
+    Returns the last result and the stats.
+    '''
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+
+    # Memory is measured apart so tracing does not inflate the times
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, {'min': min(times), 'median': float(np.median(times)), 'peak_bytes': peak}
+
+
+def measure_frames(update, n_frames, n_times):
+    '''
+    Time update(timepoint) over n_frames timepoints spread across the recording.
+    '''
+    timepoints = np.linspace(1, n_times - 1, n_frames).astype(int)
+    update(timepoints[0])  # First call builds caches
+
+    times = np.empty(n_frames)
+    for ii, timepoint in enumerate(timepoints):
+        start = time.perf_counter()
+        update(timepoint)
+        times[ii] = time.perf_counter() - start
+
+    tracemalloc.start()
+    update(timepoints[-1])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'median': float(np.median(times)), 'p99': float(np.percentile(times, 99)),
+            'max': float(times.max()), 'peak_bytes': peak}
+
+
+def run_case(N, C, seconds, density, repeat=3, n_frames=200, objects=True, seed=0):
+    '''
+    Benchmark every stage of the pipeline for one configuration.
+    '''
+    md = metadata(N, C)
+    spikes = spike_train(N, seconds, fs=md['fs'], density=density, random_state=seed)
+    N_to_C = np.arange(N) % C
+    stages = {}
+
+    def add_duration():
+        id = ID(md)
+        id.addDuration(bins=spikes, bin_channels=N_to_C)
+        return id
+    id, stages['add_duration'] = measure(add_duration, repeat)
+    binary = id.durations[0].bins[0]
+
+    def clear_trails():
+        binary.trails = {}
+    trail, stages['trail'] = measure(lambda: binary.trail(TRAIL=10), repeat, setup=clear_trails)
+
+    connect, stages['connectivity'] = measure(lambda: SparseEdges.from_activity(trail), repeat)
+    intersection_matrices, stages['carousel'] = measure(
+        lambda: envs.carousel_metadata(md, binary), repeat)
+    xyz, stages['position_slicer'] = measure(
+        lambda: envs.position_slicer(intersection_matrices, method=[], ignore_streams=True), repeat)
+
+    if objects:
+        from engram.episodic.objects import SourceObj, ConnectObj
+        umax = float(trail.max())
+
+        # Same configuration as envs.separation_objects
+        text = ['S' + str(k) for k in range(xyz.shape[0])]
+        s_obj, stages['source_obj'] = measure(lambda: SourceObj(
+            'SourceObj1', xyz, data=trail, color='crimson', text=text, alpha=.5, edge_width=2.,
+            radius_min=1., radius_max=25., radius_window=2048), repeat)
+        c_obj, stages['connect_obj'] = measure(lambda: ConnectObj(
+            'ConnectObj1', xyz, connect, color_by='strength', dynamic=(.1, 1.), cmap='gnuplot',
+            vmin=.1, vmax=umax - 1, line_width=0.1, clim=(0, umax), antialias=True,
+            incremental=True), repeat)
+
+        def update(timepoint):
+            s_obj._update_radius(timepoint=timepoint)
+            c_obj._update_time(timepoint=timepoint)
+        stages['frame'] = measure_frames(update, n_frames, trail.shape[1])
+
+    return {'N': N, 'C': C, 'seconds': seconds, 'density': density,
+            'spikes': int(spikes.nnz), 'edges': int(len(connect.values)),
+            'stages': stages}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the separation pipeline.')
+    parser.add_argument('--N', type=int, nargs='+', default=[100], help='Number of sources')
+    parser.add_argument('--C', type=int, nargs='+', default=[25], help='Number of streams (N must be a multiple of C)')
+    parser.add_argument('--seconds', type=float, nargs='+', default=[5.], help='Recording lengths')
+    parser.add_argument('--density', type=float, nargs='+', default=[.005], help='Spike densities')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage')
+    parser.add_argument('--frames', type=int, default=200, help='Frames for the update cost')
+    parser.add_argument('--no-objects', action='store_true', help='Skip the visual objects and the frame updates')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmark.json', help='Output JSON file')
+    args = parser.parse_args(args)
+
+    results = []
+    for N, C, seconds, density in itertools.product(args.N, args.C, args.seconds, args.density):
+        print('N={} C={} seconds={} density={}'.format(N, C, seconds, density))
+        result = run_case(N, C, seconds, density, repeat=args.repeat, n_frames=args.frames,
+                          objects=not args.no_objects, seed=args.seed)
+        for stage, stats in result['stages'].items():
+            print('    {:<16} {:10.4f} s {:10.1f} MB'.format(
+                stage, stats['median'], stats['peak_bytes'] / 1e6))
+        results.append(result)
+
+    with open(args.out, 'w') as f:
+        json.dump({'python': platform.python_version(), 'numpy': np.__version__,
+                   'machine': platform.machine(), 'processor': platform.processor(),
+                   'cases': results}, f, indent=2)
+    print('Saved ' + args.out)
+
+
+if __name__ == '__main__':
+    main()
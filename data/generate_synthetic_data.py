@@ -1,10 +1,11 @@
 
 from scipy.sparse import random
+import numpy as np
 
-def spike_train(n,seconds,fs=2000):
-    spikes = random(n,seconds*fs,density=0.005)
-    spikes = (spikes.toarray() > 0).astype(int)
+def spike_train(n,seconds,fs=2000,density=0.005,random_state=None):
+    spikes = random(n,int(seconds*fs),density=density,format='csr',random_state=random_state)
+    spikes.data[:] = 1
     
 
-    return spikes
+    return spikes.astype(np.int8) # Sparse Channels x Time
 
@@ -0,0 +1,151 @@
+'''
+Ingest many recording sessions into the ID store in parallel.
+
+Sessions are given as a data directory (every sub-directory holding a
+``<name><signals>`` and ``<name><events>`` file pair) or as a JSON manifest
+listing session names or metadata overrides:
+
+    ["session-1", {"name": "session-2", "fs": 1000}]
+
+Each session starts from :data:`settings.customconfig.metadata` with its
+name (and overrides) replaced, is loaded with
+:func:`data.load_custom_data.neo_loader`, optionally standardized and cut
+into trials, then saved to the store. Sessions run in a process pool.
+
+Run from the repository root:
+
+    python -m data.ingest data --workers 4 --features stft --trials --out ingest.json
+'''
+
+import argparse
+import copy
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from settings import customconfig
+from data.load_custom_data import neo_loader
+
+
+def sessions(source, base=None):
+    '''
+    Get the metadata of every session of a data directory or JSON manifest.
+    '''
+    base = customconfig.metadata if base is None else base
+    extensions = base['extensions']
+
+    if os.path.isdir(source):
+        entries = [name for name in sorted(os.listdir(source))
+                   if all(os.path.isfile(os.path.join(source, name, name + extensions[kind]))
+                          for kind in ['signals', 'events'])]
+    else:
+        with open(source) as f:
+            entries = json.load(f)
+
+    mds = []
+    for entry in entries:
+        md = copy.deepcopy(base)
+        md.update({'name': entry} if isinstance(entry, str) else entry)
+        mds.append(md)
+    return mds
+
+
+def ingest(md, dir='data', datadir='users', lazy=False, features=None, trials=False):
+    '''
+    Load, process and save one session. Returns the time of every stage.
+    '''
+    stages = {}
+    start = time.perf_counter()
+    id = neo_loader(md, dir, lazy=lazy, save=False)
+    stages['load'] = time.perf_counter() - start
+
+    if features:
+        start = time.perf_counter()
+        id.standardize(form=features)
+        stages['features'] = time.perf_counter() - start
+
+    if trials:
+        start = time.perf_counter()
+        id.extractTrials()
+        stages['trials'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    id.save(datadir)
+    stages['save'] = time.perf_counter() - start
+
+    return stages
+
+
+def run(mds, workers=None, **kwargs):
+    '''
+    Ingest sessions in a pool of workers, reporting each one as it finishes.
+    Returns the stage times (or error) of every session, in order.
+    '''
+    results = {}
+
+    def report(md, result):
+        results[md['name']] = result
+        status = 'failed: ' + result['error'] if 'error' in result else '{:.1f} s'.format(result['seconds'])
+        print('[{}/{}] {} {}'.format(len(results), len(mds), md['name'], status))
+
+    if workers == 1:
+        # In process, for debugging
+        for md in mds:
+            report(md, _timed(md, **kwargs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_timed, md, **kwargs): md for md in mds}
+            for future in as_completed(futures):
+                report(futures[future], future.result())
+
+    return [dict(name=md['name'], **results[md['name']]) for md in mds]
+
+
+def _timed(md, **kwargs):
+    start = time.perf_counter()
+    try:
+        stages = ingest(md, **kwargs)
+    except Exception as e:
+        return {'error': '{}: {}'.format(type(e).__name__, e), 'seconds': time.perf_counter() - start}
+    return {'stages': stages, 'seconds': time.perf_counter() - start}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Ingest recording sessions into the ID store.')
+    parser.add_argument('source', help='Data directory or JSON manifest of sessions')
+    parser.add_argument('--dir', default=None, help='Data directory of a manifest (default: its folder)')
+    parser.add_argument('--datadir', default='users', help='Store directory')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--lazy', action='store_true', help='Keep signals memory-mapped')
+    parser.add_argument('--features', default=None, help="Features to derive (e.g. 'stft')")
+    parser.add_argument('--trials', action='store_true', help='Cut trials around the event of interest')
+    parser.add_argument('--out', default=None, help='Output JSON file of the timings')
+    args = parser.parse_args(args)
+
+    dir = args.source if os.path.isdir(args.source) else (args.dir or os.path.dirname(args.source) or '.')
+    mds = sessions(args.source)
+    print('Ingesting {} sessions'.format(len(mds)))
+
+    start = time.perf_counter()
+    results = run(mds, workers=args.workers, dir=dir, datadir=args.datadir, lazy=args.lazy,
+                  features=args.features, trials=args.trials)
+    total = time.perf_counter() - start
+
+    for result in results:
+        if 'stages' in result:
+            print('    {:<24} {}'.format(result['name'], '  '.join(
+                '{} {:.1f} s'.format(stage, seconds) for stage, seconds in result['stages'].items())))
+    failed = [result['name'] for result in results if 'error' in result]
+    print('{} sessions in {:.1f} s, {} failed'.format(len(results), total, len(failed)))
+
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump({'seconds': total, 'sessions': results}, f, indent=2)
+        print('Saved ' + args.out)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
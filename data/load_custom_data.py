@@ -1,4 +1,4 @@
-from engram.declarative import ID
+from engram.declarative import ID, RawSignal
 from engram.procedural import events
 from settings import customconfig
 from scipy.io import loadmat
@@ -6,28 +6,33 @@ import neo
 import numpy as np
 import os
 
-def neo_loader(md, dir='data'):
+def neo_loader(md, dir='data', lazy=False, datadir='users', save=True):
     # Load Signals Using Neo
     filename = os.path.join(dir, f"{md['name']}",
                                             f"{md['name']}{md['extensions']['signals']}")
-    reader = neo.get_io(filename=filename)
 
-    blks = reader.read(lazy=False)
-    for blk in blks:
-        for seg in blk.segments:
-            raw_sigs = reader.get_analogsignal_chunk(block_index=0, seg_index=0)
-            float_sigs = reader.rescale_signal_raw_to_float(raw_sigs, dtype='float64')
-            data = np.transpose(float_sigs)
-            fs = reader.get_signal_sampling_rate()
-            units = reader.header['signal_channels'][0]['units']
+    if lazy:
+        # Keep raw samples memory-mapped and rescale windows on demand
+        data = RawSignal(filename, channel_indexes=np.asarray(md['all_streams'])-1)
 
-    data = data[np.asarray(md['all_streams'])-1]
+    else:
+        reader = neo.get_io(filename=filename)
+
+        blks = reader.read(lazy=False)
+        for blk in blks:
+            for seg in blk.segments:
+                raw_sigs = reader.get_analogsignal_chunk(block_index=0, seg_index=0)
+                float_sigs = reader.rescale_signal_raw_to_float(raw_sigs, dtype='float64')
+                data = np.transpose(float_sigs)
+                fs = reader.get_signal_sampling_rate()
+                units = reader.header['signal_channels'][0]['units']
+
+        data = data[np.asarray(md['all_streams'])-1]
 
     # Load Events (including spikes)
     eventsname = os.path.join(dir, f"{md['name']}",
                                         f"{md['name']}{md['extensions']['events']}")
-    reader = neo.get_io(filename=eventsname)
-    events_, spikes_ = events.select(md['project'], reader)
+    events_, spikes_ = events.load(md['project'], eventsname)
 
     # Load Spikes (convert spikes to binary array + derive source channel)
     bin_chans = []
@@ -38,7 +43,7 @@ def neo_loader(md, dir='data'):
 
     id = ID(md)
     id.addDuration(conts=data, cont_channels=md['all_streams'], \
-        bin_timestamps=spike_times, bin_channels=bin_chans)
+        bin_timestamps=spike_times, bin_channels=bin_chans, events=events_)
 
     for ii, _ in enumerate(id.durations):
         for jj, _ in enumerate(id.durations[ii].bins):
@@ -46,6 +51,7 @@ def neo_loader(md, dir='data'):
                 id.durations[ii].bins[jj].makeVectorsFromTimestamps(np.size(id.durations[ii].conts[jj].data,1))
             else:
                 id.durations[ii].bins[jj].makeVectorsFromTimestamps()
-    id.save()
+    if save:
+        id.save(datadir)
 
     return id
@@ -21,6 +21,10 @@ from engram.declarative.id import ID
 from engram.declarative.duration import Duration
 from engram.declarative.bin import Bin
 from engram.declarative.cont import Cont
+from engram.declarative.raw import RawSignal
+from engram.declarative.timeaxis import TimeAxis
+from engram.declarative.channelindex import ChannelIndex
+from engram.declarative.stream import SpikeRing, ContRing, SocketStream, FileTailStream
 
 objectlist = [ID, Duration, Bin, Cont]
 
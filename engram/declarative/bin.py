@@ -3,61 +3,136 @@ This module defines :class:`Bin`,  a container for binary data.
 '''
 
 import numpy as np
+from scipy import sparse
+
+from engram.declarative.timeaxis import TimeAxis
+from engram.declarative.channelindex import ChannelIndex
+
+def trail_kernel(TRAIL=10):
+    '''
+    Offsets and weights of the triangular kernel used to display spikes.
+    '''
+    kernel = np.concatenate((np.linspace(0, 1, TRAIL), [2.], np.linspace(1, 0, TRAIL)[1:]))
+    offsets = np.arange(-TRAIL, TRAIL)
+    return offsets, kernel
 
 class Bin(object):
+
+    '''
+    Container for binary spike data. Spikes are held as a Channels x Time
+    scipy.sparse CSR matrix in ``spikes``; ``data`` gives a dense view on
+    request.
+    '''
+
     def __init__(self, id, data=[], timestamps = [], \
                 channel_labels = [], metadata=None):
 
-        # Get number of elements in data
-        numel = 1
-        for dim in np.shape(data): numel *= dim
-
         # Check if data is continuous or binary
         try:
-            if (len(data) > 0) and (not ((data==0) | (data==1)).all() and not timestamps):
+            values = data.data if sparse.issparse(data) else np.asarray(data)
+            if (np.size(values) > 0) and (not ((values==0) | (values==1)).all() and not len(timestamps)):
                 print( "Invalid binary input. Nothing has been stored." )
         except:
             if data:
                 return "Something is wrong with this input. Nothing has been stored."
         else:
             self.id = id
-            self.timestamps = np.asarray(timestamps)
-            self.data = np.asarray(data) # Channels x Time
+            self.timestamps = [np.sort(np.asarray(times)) for times in timestamps] # Sorted per channel
             self.representation = 'raw'
             self.metadata = metadata
 
             self.nD_labels = {}
             self.nD_labels['1D'] = np.asarray(channel_labels)
+            self.channel_index = ChannelIndex(self.nD_labels['1D'])
 
             if np.ndim(data) <= 1:
                 length = 0 # Time
                 for source in self.timestamps:
-                    length = np.ceil(np.maximum(np.max(source),length))
-                self.nD_labels['2D'] = np.arange(0,length*self.metadata['fs'])/self.metadata['fs']
+                    if len(source):
+                        length = np.ceil(np.maximum(np.max(source),length))
+                self.makeVectorsFromTimestamps(np.ceil(length*self.metadata['fs']))
             else: 
-                self.nD_labels['2D'] = np.arange(0,np.size(self.data, 1))/self.metadata['fs']
+                self.spikes = sparse.csr_matrix(data, dtype=np.int8) # Channels x Time
+                self.nD_labels['2D'] = TimeAxis(0, self.metadata['fs'], self.spikes.shape[1])
             self.nD_labels['3D'] = None # ???
 
+            self.trails = {}
+
     def __repr__(self):
         return "Bin('{},'{}',{})".format(self.id, self.date)
 
     def __str__(self):
         return '{} _ {}'.format(self.id, self.date)
 
+    def __setstate__(self, state):
+        # Bins pickled before spikes were kept sparse
+        if 'data' in state:
+            state['spikes'] = sparse.csr_matrix(np.atleast_2d(state.pop('data')), dtype=np.int8)
+        self.__dict__.update(state)
+        # Bins pickled before the channel index (store labels are joined later)
+        if not hasattr(self, 'channel_index') and isinstance(self.nD_labels['1D'], np.ndarray):
+            self.channel_index = ChannelIndex(self.nD_labels['1D'])
+
+    @property
+    def data(self):
+        '''Dense Channels x Time view of the spikes.'''
+        return self.spikes.toarray()
+
+    @data.setter
+    def data(self, value):
+        self.spikes = sparse.csr_matrix(value, dtype=np.int8)
+
     def makeVectorsFromTimestamps(self,length=None):
-        
+        '''
+        Build the sparse spikes from the timestamps, over length samples (up
+        to the last spike by default). The time labels follow the new length.
+        '''
+        fs = self.metadata['fs']
+        indices = [np.unique(np.round(times*fs).astype('int')) for times in self.timestamps]
+
         if not length:
-            length =  0
-            for source,idx in enumerate(self.timestamps):
-                length = np.ceil(np.maximum(np.max(source),length))
-            length = length * self.metadata['fs']
-        
-        data = np.zeros((len(self.timestamps),length))
-        for idx, times in enumerate(self.timestamps):
-            rounded_indices = np.round(times*self.metadata['fs']).astype('int')
-            data[idx][rounded_indices] = 1
-
-        self.data = data
+            length = max([idx[-1] + 1 for idx in indices if len(idx)], default=0)
+
+        # Spikes past the requested length are dropped
+        indices = [idx[idx < length] for idx in indices]
+        indptr = np.concatenate(([0], np.cumsum([len(idx) for idx in indices]))).astype(int)
+        cols = np.concatenate(indices).astype(int) if indices else np.array([], dtype=int)
+
+        self.spikes = sparse.csr_matrix((np.ones(len(cols), dtype=np.int8), cols, indptr),
+                                        shape=(len(indices), int(length)))
+        self.nD_labels['2D'] = TimeAxis(0, fs, length)
+        self.trails = {} # Envelopes of the previous spikes
+
+    def trail(self, TRAIL=10, timepoints=None):
+        '''
+        Convert spikes into a continuous envelope for display.
+
+        Each spike is convolved with a triangular kernel that ramps up over the
+        TRAIL samples before it and back down over the TRAIL samples after it.
+        Works directly on the sparse spikes and returns a Channels x Time
+        float32 array, cached per (TRAIL, timepoints).
+        '''
+        key = (TRAIL, timepoints)
+        if not hasattr(self, 'trails'):
+            self.trails = {}
+        if key in self.trails:
+            return self.trails[key]
+
+        spikes = self.spikes[:, :timepoints].tocoo()
+        channels, times, shape = spikes.row, spikes.col, spikes.shape
+
+        offsets, kernel = trail_kernel(TRAIL)
+
+        # Spikes are unique per channel and time, so each shifted copy can be
+        # added without collisions
+        envelope = np.zeros(shape, dtype=np.float32)
+        for offset, weight in zip(offsets, kernel):
+            shifted = times + offset
+            valid = (shifted >= 0) & (shifted < shape[1])
+            envelope[channels[valid], shifted[valid]] += weight
+
+        self.trails[key] = envelope
+        return envelope
 
     def bspline(self):
         print( 'TO DO' )
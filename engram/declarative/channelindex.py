@@ -0,0 +1,69 @@
+'''
+This module defines :class:`ChannelIndex`, the map between the streams
+(channels) of a container and its sources.
+'''
+
+import numpy as np
+
+
+class ChannelIndex(object):
+
+    '''
+    CSR-style index of the sources of each stream, built once from the
+    per-source channel labels.
+
+    Sources grouped by stream are ``order``, and the sources of the i-th
+    stream of ``streams`` are ``order[indptr[i]:indptr[i+1]]`` (in source
+    order). ``inverse`` gives the position in ``streams`` of every source.
+    '''
+
+    def __init__(self, labels=[]):
+        labels = np.asarray(labels)
+        self.streams, self.inverse, self.counts = np.unique(labels, return_inverse=True, return_counts=True)
+        self.inverse = np.ravel(self.inverse)
+        self.indptr = np.concatenate(([0], np.cumsum(self.counts))).astype(int)
+        self.order = np.argsort(self.inverse, kind='stable')
+        self._positions = {stream: ii for ii, stream in enumerate(self.streams.tolist())}
+
+    def __repr__(self):
+        return "ChannelIndex({},{})".format(len(self.streams), len(self.inverse))
+
+    def __str__(self):
+        return '{} _ {}'.format(len(self.streams), len(self.inverse))
+
+    def __len__(self):
+        return len(self.streams)
+
+    def __contains__(self, stream):
+        return stream in self._positions
+
+    def locate(self, streams):
+        '''
+        Position of each stream in ``streams`` (-1 for streams without sources).
+        '''
+        return np.array([self._positions.get(stream, -1) for stream in np.atleast_1d(streams).tolist()], dtype=int)
+
+    def count(self, streams):
+        '''
+        Number of sources of each stream (0 for unknown streams).
+        '''
+        return np.append(self.counts, 0)[self.locate(streams)]
+
+    def sources(self, stream):
+        '''
+        Indices of the sources of a stream.
+        '''
+        ii = self._positions.get(stream)
+        if ii is None:
+            return np.array([], dtype=int)
+        return self.order[self.indptr[ii]:self.indptr[ii + 1]]
+
+    def select(self, streams):
+        '''
+        Indices of the sources of several streams, stream after stream.
+        '''
+        positions = self.locate(streams)
+        positions = positions[positions >= 0]
+        if not len(positions):
+            return np.array([], dtype=int)
+        return np.concatenate([self.order[self.indptr[ii]:self.indptr[ii + 1]] for ii in positions])
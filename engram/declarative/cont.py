@@ -2,6 +2,9 @@
 This module defines :class:`Cont`,  a container for continuous data.
 '''
 from engram.procedural import filters
+from engram.declarative.raw import RawSignal
+from engram.declarative.timeaxis import TimeAxis
+from engram.declarative.channelindex import ChannelIndex
 
 import numpy as np
 from scipy import signal
@@ -16,7 +19,7 @@ class Cont(object):
 
         # Check if data is continuous or binary
         try:
-            if ((data==0) | (data==1)).all():
+            if not isinstance(data, RawSignal) and ((data==0) | (data==1)).all():
                 return "Invalid continuous input. Nothing has been stored."
         except:
             if data:
@@ -25,13 +28,14 @@ class Cont(object):
         else:
             self.id = id
             self.timestamps = np.asarray(timestamps)
-            self.data = np.asarray(data) # Channels x Time
+            self.data = data if isinstance(data, RawSignal) else np.asarray(data) # Channels x Time
             self.representation = 'raw'
             self.metadata = metadata
 
             self.nD_labels = {}
             self.nD_labels['1D'] = np.asarray(channel_labels)
-            self.nD_labels['2D'] = np.arange(0,np.size(self.data, 1))/self.metadata['fs'] # Time
+            self.channel_index = ChannelIndex(self.nD_labels['1D'])
+            self.nD_labels['2D'] = TimeAxis(0, self.metadata['fs'], np.size(self.data, 1)) # Time
             self.nD_labels['3D'] = None # ???
 
     def __repr__(self):
@@ -40,24 +44,31 @@ class Cont(object):
     def __str__(self):
         return '{} _ {}'.format(self.id, self.date)
 
-    def lfp(self):
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Conts pickled before the channel index (store labels are joined later)
+        if not hasattr(self, 'channel_index') and isinstance(self.nD_labels['1D'], np.ndarray):
+            self.channel_index = ChannelIndex(self.nD_labels['1D'])
 
-        lfp = np.empty(self.data.shape)
-        if np.ndim(self.data) == 2:
-            for channel in range(np.size(self.data, 0)):
-                self.data[channel, :] = filters.select('bandpass',self.data[channel, :],min=self.metadata['bandpass_min'],
-                                                    max=self.metadata['bandpass_max'],
-                                                    fs=self.metadata['fs'],
-                                                    order=5)
-            self.nD_labels['2D'] = np.asarray(range(np.size(self.data, 1)))/self.metadata['fs']
+    def window(self, start=None, stop=None, channels=slice(None)):
+        '''
+        Get a Channels x Time window of the data. Lazily-loaded signals are
+        only read and rescaled for the requested window.
+        '''
+        return self.data[channels, start:stop]
+
+    def lfp(self, chunk=None):
 
-        elif np.ndim(self.data) == 1:
+        # Lazy signals are streamed through the filter one chunk at a time
+        if isinstance(self.data, RawSignal) and chunk is None:
+            chunk = int(60 * self.metadata['fs'])
+
+        if np.ndim(self.data) in (1, 2):
             self.data = filters.select('bandpass',self.data,min=self.metadata['bandpass_min'],
                                                     max=self.metadata['bandpass_max'],
                                                     fs=self.metadata['fs'],
-                                                    order=5)
-            self.nD_labels['2D'] = range(np.size(self.data,1))/self.metadata['fs']
-            
+                                                    order=5, axis=-1, chunk=chunk)
+            self.nD_labels['2D'] = TimeAxis(0, self.metadata['fs'], np.size(self.data, -1))
 
         else:
             print('Input array has too many dimensions')
@@ -66,62 +77,39 @@ class Cont(object):
         
         return self
 
-    def stft(self):
+    def stft(self, chunk=None):
 
         lfp = self.lfp().data
-
-        N = 1e5
-        amp = 2 * np.sqrt(2)
-        noise_power = 0.01 * self.metadata['fs'] / 2
-        time = np.arange(N) / float(self.metadata['fs'])
-        mod = 500 * np.cos(2 * np.pi * 0.25 * time)
-        carrier = amp * np.sin(2 * np.pi * 3e3 * time + mod)
-        noise = np.random.normal(scale=np.sqrt(noise_power),
-                                    size=time.shape)
-        noise *= np.exp(-time / 5)
-        x = carrier + noise
-
-        window= int(self.metadata['t_bin'] * self.metadata['fs'])
-        c_len = lfp.shape[0]
-
-        if np.ndim(lfp) == 2:
-            for channel in range(len(lfp)):
-                temp_f, temp_t, temp_Zxx = signal.spectrogram(lfp[channel, :],
-                                                                self.metadata['fs'],
-                                                                'hann', nperseg=window)
-
-                freq_slice = np.where((temp_f >= self.metadata['2D_min']) & (temp_f <= self.metadata['2D_max']))
-                Zxx = temp_Zxx[freq_slice, :][0]
-                del temp_Zxx
-
-                if channel == 0:
-                    power = np.empty([c_len, np.shape(Zxx)[1], np.shape(Zxx)[0]], dtype=float)
-                    f = temp_f[freq_slice]
-                    t = temp_t
-                del temp_t
-                del temp_f
-                power[channel, :, :] = np.transpose(Zxx ** 2) # Channels x Time x Freq
-                del Zxx
-
-        if np.ndim(lfp) == 1:
-            temp_f, temp_t, temp_Zxx = signal.spectrogram(lfp,
-                                                            self.metadata['fs'],
-                                                            'hann', nperseg=window)
-
-            freq_slice = np.where((temp_f >= self.metadata['2D_min']) & (temp_f <= self.metadata['2D_max']))
-            Zxx = temp_Zxx[freq_slice, :][0]
-            del temp_Zxx
-            power = np.empty([c_len, np.shape(Zxx)[1], np.shape(Zxx)[0]], dtype=float)
-            f = temp_f[freq_slice]
-            t = temp_t
-            del temp_t
-            del temp_f
-            power = np.transpose(Zxx ** 2) # Time x Freq
+        fs = self.metadata['fs']
+
+        window = int(self.metadata['t_bin'] * fs)
+        noverlap = window // 8 # scipy.signal.spectrogram default
+        step = window - noverlap
+        n_segments = (np.size(lfp, -1) - window) // step + 1
+        if n_segments < 1:
+            raise ValueError('Recording of {} samples is shorter than one STFT window '
+                             '(t_bin * fs = {} samples)'.format(np.size(lfp, -1), window))
+
+        f = np.fft.rfftfreq(window, 1/fs)
+        freq_slice = (f >= self.metadata['2D_min']) & (f <= self.metadata['2D_max'])
+
+        # Whole segments per chunk, so chunks tile the same segments as one call
+        if chunk is None:
+            chunk = int(60 * fs)
+        segments_per_chunk = max(chunk // step, 1)
+
+        power = np.empty(np.shape(lfp)[:-1] + (n_segments, np.count_nonzero(freq_slice)), dtype=np.float32) # (Channels x) Time x Freq
+        for first in range(0, n_segments, segments_per_chunk):
+            last = min(first + segments_per_chunk, n_segments)
+            _, _, Zxx = signal.spectrogram(lfp[..., first*step:(last-1)*step + window], fs,
+                                           'hann', nperseg=window, noverlap=noverlap, axis=-1)
+            Zxx = Zxx[..., freq_slice, :]
+            power[..., first:last, :] = np.swapaxes(Zxx, -1, -2) ** 2
             del Zxx
 
         self.data = power
-        self.nD_labels['2D'] = t
-        self.nD_labels['3D'] = f
+        self.nD_labels['2D'] = TimeAxis(window / 2 / fs, fs / step, n_segments) # Segment centers
+        self.nD_labels['3D'] = f[freq_slice]
 
         if self.metadata['norm']:
             self.normalize()
@@ -136,8 +124,7 @@ class Cont(object):
                 freqMu = np.mean(self.data,axis=1)
                 freqSig = np.std(self.data,axis=1)
 
-                for channel in range(len(self.data)):
-                    self.data[channel,:,:] = (self.data[channel] - freqMu[channel])/freqSig[channel]
+                self.data = (self.data - freqMu[:,np.newaxis,:])/freqSig[:,np.newaxis,:]
             elif np.ndim(self.data) == 2 or 1:
                 freqMu = np.mean(self.data,axis=0)
                 freqSig = np.std(self.data,axis=0)
@@ -3,6 +3,8 @@ This module defines :class:`Duration`,  a container for unique periods of time.
 '''
 from engram.declarative.bin import Bin
 from engram.declarative.cont import Cont
+from engram.declarative.raw import RawSignal
+from engram.declarative.timeaxis import TimeAxis
 
 import numpy as np
 
@@ -33,53 +35,67 @@ class Duration(object):
         self.conts.append(Cont(self.id, data=data, timestamps=timestamps, channel_labels=channel_labels, metadata=self.metadata))
 
     def makeROIs(self):
-        times = self.events[self.metadata['event_of_interest']]
-        
-        # Only continue if Conts and Bins have the same time vectors
-        nconts = len(self.conts)
-        nbins = len(self.bins)
+        times = np.asarray(self.events[self.metadata['event_of_interest']])
+        bounds = self.metadata['roi_bounds']
+
         obj_names = ['Conts','Bins']
         objects = {obj_names[0]:self.conts, obj_names[1]: self.bins}
-        trials = np.asarray([{obj_names[0]:[], obj_names[1]: []} for _ in range(len(times))])
-
-        prev_len = None
-
-        for trial,time in enumerate(times):
-            for ii, obj_type in enumerate(objects):
-                for jj, obj in enumerate(objects[obj_type]):
-                    bounds = self.metadata['roi_bounds']
-                    upper_index = (np.abs(obj.nD_labels['2D'] - (time + bounds[1]))).argmin()
-                    lower_index = (np.abs(obj.nD_labels['2D'] - (time + bounds[0]))).argmin()
-                    diff_one = upper_index-lower_index
-                    if prev_len:
-                        if prev_len != diff_one:
-                            diff_two = prev_len - diff_one
-                            if diff_one % 2:
-                                center = lower_index+diff_one/2
-                                offset = (prev_len+1)/2
-                                upper_index = center + offset
-                                lower_index = center - offset
-                                upper_index += diff_two
-                            else:
-                                upper_index += diff_two
-
-                    if np.ndim(obj.data) == 2:
-                        data = obj.data[:,lower_index:upper_index]
-                    elif np.ndim(obj.data) == 3:
-                        data = obj.data[:,lower_index:upper_index,:]
-                    trials[trial][obj_type].append(self.container_factory(style=obj_type, data=data))
-                    trials[trial][obj_type][-1].nD_labels['1D'] = obj.nD_labels['1D']
-                    trials[trial][obj_type][-1].nD_labels['2D'] = obj.nD_labels['2D'][lower_index:upper_index]
-                    
-                    prev_len = upper_index-lower_index
+        trials = {obj_names[0]:[], obj_names[1]: []}
+        trial_times = {obj_names[0]:[], obj_names[1]: []}
+
+        # One Trials x Channels x Samples (x Freq) array per object
+        for obj_type in objects:
+            for obj in objects[obj_type]:
+                epochs, relative_time = self.epochs(obj, times, bounds)
+                trials[obj_type].append(epochs)
+                trial_times[obj_type].append(relative_time)
 
         self.trials = trials
+        self.trial_times = trial_times
+
+    def epochs(self, obj, times, bounds):
+        '''
+        Cut the window [time + bounds[0], time + bounds[1]) around every time
+        out of a Bin or Cont at once.
 
+        Window starts are found with a single searchsorted over the time
+        axis and every window has the same number of samples (windows that
+        run past the recording are shifted back inside it, and windows longer
+        than the recording raise a ValueError). Returns a Trials x
+        Channels x Samples (x Freq) array and the TimeAxis relative to each
+        event.
+        '''
+        labels = obj.nD_labels['2D']
+        if isinstance(labels, TimeAxis):
+            rate = labels.fs
+        else: # Containers saved with materialized time labels
+            labels = np.asarray(labels)
+            rate = 1/(labels[1] - labels[0])
+        n_samples = int(round((bounds[1] - bounds[0]) * rate))
+        if n_samples > len(labels):
+            raise ValueError('Trial windows of {} samples (roi_bounds {}) are longer than the '
+                             'recording ({} samples)'.format(n_samples, tuple(bounds), len(labels)))
 
-    def container_factory(self,style=None, data = [], timestamps = [], channel_labels = []):
-        if style == "Bins":
-            return Bin(self.id, data=data, timestamps=timestamps, channel_labels=channel_labels, metadata=self.metadata)
-        if style == "Conts":
-            return Cont(self.id, data=data, timestamps=timestamps, channel_labels=channel_labels, metadata=self.metadata)
+        lower = self._nearest(labels, times + bounds[0])
+        lower = np.clip(lower, 0, len(labels) - n_samples)
+        indices = lower[:, np.newaxis] + np.arange(n_samples) # Trials x Samples
+
+        if isinstance(obj, Bin):
+            spikes = obj.spikes[:, indices.ravel()].toarray()
+            epochs = spikes.reshape((spikes.shape[0],) + indices.shape)
+        elif isinstance(obj.data, RawSignal):
+            epochs = np.stack([obj.window(start, start + n_samples) for start in lower], axis=1)
         else:
-            raise Exception("Unrecognized container style.")
\ No newline at end of file
+            epochs = obj.data[:, indices]
+
+        relative_time = TimeAxis(bounds[0], rate, n_samples)
+        return np.moveaxis(epochs, 1, 0), relative_time
+
+    @staticmethod
+    def _nearest(labels, values):
+        '''
+        Index of the label closest to each value (labels must be sorted).
+        '''
+        upper = np.clip(labels.searchsorted(values), 1, len(labels) - 1)
+        lower = upper - 1
+        return np.where(values - labels[lower] <= labels[upper] - values, lower, upper)
@@ -8,8 +8,9 @@ import datetime
 import neo
 import pickle
 from engram.declarative.duration import Duration
+from engram.declarative import store
 from engram.procedural import events, filters
-from engram.episodic import envs
+from engram.episodic import envs, render
 import numpy as np
 from scipy.io import loadmat
 
@@ -41,14 +42,17 @@ class ID(object):
     def save(self, datadir='users'):
         if not os.path.exists(datadir):
             os.mkdir(datadir)
-        filename = os.path.join(datadir, f"{self.id}")
-        with open(filename, "wb") as fp:
-            pickle.dump(self, fp)
+        store.save(self, os.path.join(datadir, f"{self.id}"))
         print(self.id + " saved!")
 
-    def load(self, metadata=None, datadir='users'):
+    def load(self, metadata=None, datadir='users', durations=None, mmap_mode='r'):
         filename = os.path.join(datadir, f"{self.metadata['name']}")
-        loadedID = pickle.load(open(filename, "rb"))
+
+        # Directory stores open lazily; older IDs were pickled whole
+        if store.is_store(filename):
+            loadedID = store.load(filename, durations=durations, mmap_mode=mmap_mode)
+        else:
+            loadedID = pickle.load(open(filename, "rb"))
         print(loadedID.id + " loaded!")
 
         return loadedID
@@ -75,5 +79,8 @@ class ID(object):
         for ii,duration in enumerate(self.durations):
             duration.makeROIs()
 
-    def episode(self, shader='engram',control_method='keyboard'):
-        envs.select(shader=shader,id=self,control_method=control_method)
+    def episode(self, shader='engram',control_method='keyboard',control_kwargs=None,stream=None):
+        envs.select(shader=shader,id=self,control_method=control_method,control_kwargs=control_kwargs,stream=stream)
+
+    def render(self, path, **kwargs):
+        return render.render(self, path, **kwargs)
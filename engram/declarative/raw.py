@@ -0,0 +1,117 @@
+'''
+This module defines :class:`RawSignal`, a lazy view over the analog signals
+of a recording that is read through a neo rawio reader.
+'''
+
+import os
+from neo.rawio import get_rawio_class
+from engram.procedural import cache
+import numpy as np
+
+
+class RawSignal(object):
+
+    '''
+    Lazy Channels x Time view over the analog signals of a file.
+
+    Samples stay in the (memory-mapped) file as raw integers. Indexing with
+    ``[channels, start:stop]`` only reads and rescales the requested window,
+    so memory is bounded by the window size rather than the recording length.
+
+    The header summary (channels, rate, units and length) is cached, so the
+    file is only parsed once samples are read.
+    '''
+
+    def __init__(self, filename, channel_indexes=None, block_index=0, seg_index=0, dtype='float64',
+                 use_cache=True):
+
+        # Absolute so a pickled view (e.g. in a store manifest) reopens from any directory
+        self.filename = os.path.abspath(filename)
+        self.block_index = block_index
+        self.seg_index = seg_index
+        self.dtype = np.dtype(dtype)
+        self._reader = None
+
+        def describe():
+            reader = self.reader
+            indexes = np.arange(reader.signal_channels_count()) if channel_indexes is None \
+                else np.asarray(channel_indexes)
+            return {'channel_indexes': indexes,
+                    'fs': np.float64(reader.get_signal_sampling_rate(indexes)),
+                    'units': np.str_(reader.header['signal_channels'][indexes[0]]['units']),
+                    'size': np.int64(reader.get_signal_size(block_index, seg_index, indexes))}
+
+        tag = 'signal-{}-{}-{}'.format(block_index, seg_index, 'all' if channel_indexes is None
+                                       else ','.join(str(ii) for ii in np.ravel(channel_indexes)))
+        header = cache.load(self.filename, tag, describe) if use_cache else describe()
+
+        self.channel_indexes = np.asarray(header['channel_indexes'])
+        self.fs = float(header['fs'])
+        self.units = str(header['units'])
+        self.shape = (len(self.channel_indexes), int(header['size']))
+
+    def __repr__(self):
+        return "RawSignal('{}',{})".format(self.filename, self.shape)
+
+    def __str__(self):
+        return '{} _ {}'.format(self.filename, self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getstate__(self):
+        # The reader holds open memory maps, so only keep what rebuilds it
+        state = self.__dict__.copy()
+        state['_reader'] = None
+        return state
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        channels, times = key
+
+        if isinstance(times, slice):
+            start, stop, step = times.indices(self.shape[1])
+            return self.window(start, stop, channels)[..., ::step]
+        else:
+            return self.window(int(times), int(times) + 1, channels)[..., 0]
+
+    def __array__(self, dtype=None):
+        data = self.window()
+        return data if dtype is None else data.astype(dtype)
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self._reader = get_rawio_class(self.filename)(filename=self.filename)
+            self._reader.parse_header()
+        return self._reader
+
+    def raw(self, start=None, stop=None, channels=slice(None)):
+        '''
+        Read a Channels x Time window of raw (unscaled) samples.
+        '''
+        return self._read(start, stop, channels, rescale=False)
+
+    def window(self, start=None, stop=None, channels=slice(None)):
+        '''
+        Read a Channels x Time window rescaled to physical units.
+        '''
+        return self._read(start, stop, channels, rescale=True)
+
+    def _read(self, start, stop, channels, rescale):
+        channel_indexes = np.atleast_1d(self.channel_indexes[channels])
+        chunk = self.reader.get_analogsignal_chunk(block_index=self.block_index, seg_index=self.seg_index,
+                                                   i_start=start, i_stop=stop,
+                                                   channel_indexes=channel_indexes)
+        if rescale:
+            chunk = self.reader.rescale_signal_raw_to_float(chunk, dtype=self.dtype,
+                                                            channel_indexes=channel_indexes)
+        chunk = np.transpose(chunk)
+
+        # A single channel index returns a single trace
+        return chunk if np.ndim(self.channel_indexes[channels]) else chunk[0]
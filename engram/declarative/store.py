@@ -0,0 +1,161 @@
+'''
+This module defines the on-disk store for :class:`ID`.
+
+Each ID is saved as a directory holding a small pickled manifest (the ID,
+Duration, Bin and Cont skeletons and their metadata) and one .npy file per
+array. Arrays are reopened as memory maps, so loading a session only reads
+the manifest and individual durations or channel ranges are read on access.
+'''
+
+import os
+import copy
+import pickle
+import numpy as np
+from scipy import sparse
+
+from engram.declarative.duration import Duration
+from engram.declarative.bin import Bin
+from engram.declarative.cont import Cont
+from engram.declarative.channelindex import ChannelIndex
+
+MANIFEST = 'manifest.pkl'
+
+
+class Column(object):
+
+    '''
+    Placeholder for an array stored in its own .npy file.
+    '''
+
+    def __init__(self, path, shape, dtype):
+        self.path = path
+        self.shape = shape
+        self.dtype = dtype
+
+    def __repr__(self):
+        return "Column('{}',{},{})".format(self.path, self.shape, self.dtype)
+
+    def __str__(self):
+        return '{} _ {}'.format(self.path, self.shape)
+
+
+class SparseColumn(object):
+
+    '''
+    Placeholder for a CSR matrix stored as data, indices and indptr columns.
+    '''
+
+    def __init__(self, shape, data, indices, indptr):
+        self.shape = shape
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+
+    def __repr__(self):
+        return "SparseColumn({},'{}')".format(self.shape, self.data.path)
+
+    def __str__(self):
+        return '{} _ {}'.format(self.data.path, self.shape)
+
+
+def save(id, path):
+    '''
+    Write an ID to a directory store.
+    '''
+    # Replace a legacy whole-object pickle saved under the same name
+    if os.path.isfile(path):
+        os.remove(path)
+    os.makedirs(path, exist_ok=True)
+
+    skeleton = copy.copy(id)
+    skeleton.durations = [_split(duration, path, os.path.join('durations', str(ii)))
+                          for ii, duration in enumerate(id.durations)]
+
+    with open(os.path.join(path, MANIFEST), "wb") as fp:
+        pickle.dump(skeleton, fp)
+
+
+def load(path, durations=None, mmap_mode='r'):
+    '''
+    Read an ID from a directory store. Arrays are memory-mapped unless
+    mmap_mode is None; use durations to only open a subset of durations.
+    '''
+    with open(os.path.join(path, MANIFEST), "rb") as fp:
+        id = pickle.load(fp)
+
+    if durations is not None:
+        id.durations = [id.durations[ii] for ii in np.atleast_1d(durations)]
+    id.durations = [_join(duration, path, mmap_mode) for duration in id.durations]
+
+    return id
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def _split(obj, root, relpath):
+    '''
+    Get a copy of obj where numeric arrays are written to .npy files and
+    replaced by a Column.
+    '''
+    if isinstance(obj, np.ndarray) and obj.dtype != object:
+        filename = relpath + '.npy'
+        full = os.path.join(root, filename)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+
+        # Write next to the target first so memory maps of a previous save stay valid
+        np.save(full + '.tmp.npy', obj)
+        os.replace(full + '.tmp.npy', full)
+        return Column(filename, obj.shape, obj.dtype)
+
+    elif sparse.issparse(obj):
+        obj = sparse.csr_matrix(obj)
+        return SparseColumn(obj.shape, *[_split(getattr(obj, part), root, os.path.join(relpath, part))
+                                         for part in ['data', 'indices', 'indptr']])
+
+    elif isinstance(obj, (Duration, Bin, Cont)):
+        clone = copy.copy(obj)
+        for key, value in obj.__dict__.items():
+            if key != 'metadata':
+                setattr(clone, key, _split(value, root, os.path.join(relpath, key)))
+        return clone
+
+    elif isinstance(obj, list):
+        return [_split(value, root, os.path.join(relpath, str(ii))) for ii, value in enumerate(obj)]
+
+    elif isinstance(obj, dict):
+        return {key: _split(value, root, os.path.join(relpath, key if isinstance(key, str) else str(ii)))
+                for ii, (key, value) in enumerate(obj.items())}
+
+    else:
+        return obj
+
+
+def _join(obj, root, mmap_mode):
+    '''
+    Replace every Column in obj by its (memory-mapped) array.
+    '''
+    if isinstance(obj, Column):
+        return np.load(os.path.join(root, obj.path), mmap_mode=mmap_mode)
+
+    elif isinstance(obj, SparseColumn):
+        parts = [_join(part, root, mmap_mode) for part in [obj.data, obj.indices, obj.indptr]]
+        return sparse.csr_matrix(tuple(parts), shape=obj.shape, copy=False)
+
+    elif isinstance(obj, (Duration, Bin, Cont)):
+        for key, value in obj.__dict__.items():
+            setattr(obj, key, _join(value, root, mmap_mode))
+        # Empty containers never got labels
+        if isinstance(obj, (Bin, Cont)) and not hasattr(obj, 'channel_index') and hasattr(obj, 'nD_labels'):
+            obj.channel_index = ChannelIndex(obj.nD_labels['1D'])
+        return obj
+
+    elif isinstance(obj, list):
+        return [_join(value, root, mmap_mode) for value in obj]
+
+    elif isinstance(obj, dict):
+        return {key: _join(value, root, mmap_mode) for key, value in obj.items()}
+
+    else:
+        return obj
@@ -0,0 +1,253 @@
+'''
+This module defines ring buffers holding the most recent samples of a live
+recording, and the threads that fill them.
+
+:class:`SpikeRing` keeps the displayed envelope of incoming spikes and
+:class:`ContRing` keeps incoming continuous samples, both as Channels x
+window arrays, so memory stays bounded however long the experiment runs.
+:class:`SocketStream` and :class:`FileTailStream` feed a ring from a local
+UDP port or from a file that another process appends to.
+
+Wire formats (little-endian, time-major):
+
+    spikes      int64 (channel, sample) pairs; channel -1 only moves the clock
+    continuous  float32 samples x channels
+
+The ID passed to :meth:`ID.episode` only provides the source layout (its
+Bin may hold a single sample):
+
+    ring = SpikeRing(N, window=10*fs, fs=fs)
+    SocketStream(ring).start()
+    id.episode(shader='separation', stream=ring)
+'''
+
+import os
+import socket
+import threading
+import time
+import numpy as np
+
+from engram.declarative.bin import trail_kernel
+
+
+class Ring(object):
+
+    '''
+    Channels x window buffer of the latest samples of a stream.
+
+    Absolute sample t is stored at column ``t % window`` and samples
+    ``head - window`` up to ``head`` are held.
+    '''
+
+    lag = 0
+
+    def __init__(self, n_channels, window, fs):
+
+        self.n_channels = n_channels
+        self.window = int(window)
+        self.fs = fs
+        self.buffer = np.zeros((n_channels, self.window), dtype=np.float32)
+        self.head = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "{}({},{},{})".format(type(self).__name__, self.n_channels, self.window, self.fs)
+
+    def __str__(self):
+        return '{} _ {}'.format(type(self).__name__, self.head)
+
+    @property
+    def shape(self):
+        return self.buffer.shape
+
+    def latest(self):
+        '''
+        Latest complete sample (-1 before any data arrived).
+        '''
+        return self.head - 1 - self.lag
+
+    def advance(self, stop):
+        '''
+        Move the head to sample stop, clearing the columns it wraps over.
+        '''
+        with self.lock:
+            self._advance(stop)
+
+    def _advance(self, stop):
+        stop = int(stop)
+        if stop <= self.head:
+            return
+        if stop - self.head >= self.window:
+            self.buffer[:] = 0
+        else:
+            self.buffer[:, np.arange(self.head, stop) % self.window] = 0
+        self.head = stop
+
+    def column(self, t):
+        '''
+        Copy of the values of every channel at absolute sample t (zeros once
+        t has left the window).
+        '''
+        with self.lock:
+            if self.head - self.window <= t < self.head and t >= 0:
+                return self.buffer[:, t % self.window].copy()
+        return np.zeros(self.n_channels, dtype=np.float32)
+
+    def view(self):
+        '''
+        Copy of the window ordered from oldest to newest sample.
+        '''
+        with self.lock:
+            return np.roll(self.buffer, -(self.head % self.window), axis=1)
+
+
+class SpikeRing(Ring):
+
+    '''
+    Ring of spike envelopes, using the triangular kernel of :meth:`Bin.trail`.
+
+    Spikes extend TRAIL samples into the future, so the latest complete
+    sample lags the head by TRAIL.
+    '''
+
+    def __init__(self, n_channels, window, fs, TRAIL=10):
+        Ring.__init__(self, n_channels, window, fs)
+        self.TRAIL = TRAIL
+        self.lag = TRAIL
+        self.offsets, self.kernel = trail_kernel(TRAIL)
+        self.vmax = float(self.kernel.max())
+
+    def push(self, channels, samples):
+        '''
+        Add spikes of channels at absolute samples. Channel -1 marks a clock
+        tick that only moves the head.
+        '''
+        channels = np.asarray(channels, dtype=int)
+        samples = np.asarray(samples, dtype=int)
+        if not len(samples):
+            return
+
+        with self.lock:
+            self._advance(samples.max() + self.TRAIL)
+            spiking = channels >= 0
+            channels, samples = channels[spiking], samples[spiking]
+            for offset, weight in zip(self.offsets, self.kernel):
+                shifted = samples + offset
+                valid = (shifted >= max(self.head - self.window, 0)) & (shifted < self.head)
+                np.add.at(self.buffer, (channels[valid], shifted[valid] % self.window), weight)
+
+    def push_bytes(self, buffer):
+        pairs = np.frombuffer(buffer, dtype='<i8').reshape(-1, 2)
+        self.push(pairs[:, 0], pairs[:, 1])
+
+    def push_lines(self, lines):
+        pairs = np.array([line.split() for line in lines if line.strip()], dtype=int).reshape(-1, 2)
+        self.push(pairs[:, 0], pairs[:, 1])
+
+
+class ContRing(Ring):
+
+    '''
+    Ring of continuous samples.
+    '''
+
+    vmax = None
+
+    def push(self, chunk):
+        '''
+        Append a Channels x Time chunk after the latest sample.
+        '''
+        chunk = np.asarray(chunk, dtype=np.float32)
+        n = chunk.shape[1]
+        with self.lock:
+            start = self.head
+            self._advance(start + n)
+            if n > self.window:
+                chunk, start = chunk[:, -self.window:], start + n - self.window
+            self.buffer[:, np.arange(start, self.head) % self.window] = chunk
+
+    def push_bytes(self, buffer):
+        self.push(np.frombuffer(buffer, dtype='<f4').reshape(-1, self.n_channels).T)
+
+    def push_lines(self, lines):
+        self.push(np.array([line.split() for line in lines if line.strip()],
+                           dtype=np.float32).reshape(-1, self.n_channels).T)
+
+
+class Stream(threading.Thread):
+
+    '''
+    Background thread filling a ring until it is closed.
+    '''
+
+    def __init__(self, ring):
+        threading.Thread.__init__(self, name=type(self).__name__, daemon=True)
+        self.ring = ring
+        self._running = True
+
+    def run(self):
+        while self._running:
+            try:
+                self._read()
+            except Exception as e:
+                if self._running:
+                    print('{} stopped: {}'.format(self.name, e))
+                break
+
+    def close(self):
+        self._running = False
+
+
+class SocketStream(Stream):
+
+    '''
+    Fill a ring from UDP datagrams sent to a local port (see wire formats).
+    '''
+
+    def __init__(self, ring, host='127.0.0.1', port=5006, timeout=1.):
+        Stream.__init__(self, ring)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(timeout)
+
+    def _read(self):
+        try:
+            buffer = self._socket.recv(65536)
+        except socket.timeout:
+            return
+        self.ring.push_bytes(buffer)
+
+    def close(self):
+        Stream.close(self)
+        self._socket.close()
+
+
+class FileTailStream(Stream):
+
+    '''
+    Fill a ring from the lines appended to a text file: 'channel sample'
+    per spike, or one whitespace-separated sample of every channel per line.
+    '''
+
+    def __init__(self, ring, path, interval=.01, from_start=False):
+        Stream.__init__(self, ring)
+        self.path = path
+        self.interval = interval
+        self._file = open(path)
+        if not from_start:
+            self._file.seek(0, os.SEEK_END)
+        self._partial = ''
+
+    def _read(self):
+        text = self._file.read()
+        if not text:
+            time.sleep(self.interval)
+            return
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()  # Keep a line that is still being written
+        if lines:
+            self.ring.push_lines(lines)
+
+    def close(self):
+        Stream.close(self)
+        self._file.close()
@@ -0,0 +1,100 @@
+'''
+This module defines :class:`TimeAxis`, the time labels of a container.
+'''
+
+import operator
+import numpy as np
+
+
+class TimeAxis(object):
+
+    '''
+    Evenly sampled time labels, ``start + i/fs`` for i in range(length).
+
+    Behaves like the equivalent float64 array for len, indexing, slicing and
+    searchsorted without holding the samples: integer and array indices give
+    the labels, slices give another TimeAxis and np.asarray materializes it.
+    '''
+
+    ndim = 1
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, start=0., fs=1., length=0):
+        self.start = float(start)
+        self.fs = float(fs)
+        self.length = int(length)
+
+    def __repr__(self):
+        return "TimeAxis({},{},{})".format(self.start, self.fs, self.length)
+
+    def __str__(self):
+        return '{} _ {}'.format(self.start, self.length)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def shape(self):
+        return (self.length,)
+
+    @property
+    def size(self):
+        return self.length
+
+    @property
+    def stop(self):
+        '''Label following the last sample.'''
+        return self._values(self.length)
+
+    def _values(self, index):
+        return self.start + index / self.fs
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step > 0:
+                return TimeAxis(self._values(start), self.fs / step, len(range(start, stop, step)))
+            return np.asarray(self)[key]
+
+        if np.ndim(key) == 0 and not isinstance(key, (bool, np.bool_)):
+            index = operator.index(key)
+            if index < 0:
+                index += self.length
+            if not 0 <= index < self.length:
+                raise IndexError('index {} is out of bounds for axis 0 with size {}'.format(key, self.length))
+            return self._values(np.int64(index))
+
+        key = np.asarray(key)
+        if key.dtype == bool:
+            if key.shape != self.shape:
+                raise IndexError('boolean index of shape {} does not match axis of length {}'.format(key.shape, self.length))
+            return self._values(np.flatnonzero(key))
+        index = np.where(key < 0, key + self.length, key).astype(np.int64)
+        if np.any((index < 0) | (index >= self.length)):
+            raise IndexError('index out of bounds for axis 0 with size {}'.format(self.length))
+        return self._values(index)
+
+    def __array__(self, dtype=None):
+        values = self._values(np.arange(self.length))
+        return values if dtype is None else values.astype(dtype)
+
+    def searchsorted(self, v, side='left'):
+        '''
+        Indices where values v would be inserted to keep the labels sorted,
+        as numpy.searchsorted on the materialized labels.
+        '''
+        v = np.asarray(v, dtype=np.float64)
+        scaled = (v - self.start) * self.fs
+        index = np.ceil(scaled) if side == 'left' else np.floor(scaled) + 1
+        index = np.clip(np.nan_to_num(index), 0, self.length).astype(np.int64)
+
+        # The estimate is off by at most one sample from the division rounding
+        before = self._values(index - 1)
+        after = self._values(index)
+        if side == 'left':
+            index = np.where((index > 0) & (before >= v), index - 1, index)
+            index = np.where((index < self.length) & (after < v), index + 1, index)
+        else:
+            index = np.where((index > 0) & (before > v), index - 1, index)
+            index = np.where((index < self.length) & (after <= v), index + 1, index)
+        return index
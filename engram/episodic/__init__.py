@@ -3,4 +3,4 @@
 :mod:'engram.episodic' provides functions for visualizing Engrams
 '''
 
-from . import (envs)
\ No newline at end of file
+from . import (envs,edges,render)
\ No newline at end of file
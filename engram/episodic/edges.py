@@ -0,0 +1,112 @@
+'''
+This module defines :class:`SparseEdges`, a time-resolved connectivity store
+that only keeps the edges that are active at each timepoint.
+'''
+
+import numpy as np
+
+
+class SparseEdges(object):
+
+    '''
+    Time-resolved co-activation edges stored as a per-timepoint CSR table.
+
+    The edges active at timepoint t are ``rows[indptr[t]:indptr[t+1]]`` and
+    ``cols[indptr[t]:indptr[t+1]]`` with weights ``values[indptr[t]:indptr[t+1]]``,
+    so memory scales with the number of active edges instead of N x N x T.
+    Indexing with ``[:, :, t]`` returns a dense (N, N) masked array so the
+    store can be used wherever a 3D ``time_edges`` array was expected.
+    '''
+
+    def __init__(self, rows, cols, values, indptr, n_nodes):
+
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.n_nodes = int(n_nodes)
+
+        assert self.rows.shape == self.cols.shape == self.values.shape
+        assert self.indptr[-1] == len(self.values)
+
+    def __repr__(self):
+        return "SparseEdges({} nodes, {} timepoints, {} edges)".format(self.n_nodes, self.n_times, len(self.values))
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __getitem__(self, key):
+        if not (isinstance(key, tuple) and len(key) == 3 and key[0] == slice(None) and key[1] == slice(None)):
+            raise IndexError("SparseEdges only supports [:, :, timepoint] indexing.")
+        return self.dense(key[2])
+
+    @classmethod
+    def from_activity(cls, activity):
+        '''
+        Derive co-activation edges from a Sources x Time activity array.
+
+        Two sources are connected at a timepoint when both are active (> 0),
+        with a weight equal to the sum of their activities. Only the upper
+        triangle (row < col) is stored.
+        '''
+        activity = np.asarray(activity)
+        n_nodes, n_times = activity.shape
+
+        # Active sources, sorted by time then source
+        t_ind, s_ind = np.nonzero(activity.T > 0)
+        counts = np.bincount(t_ind, minlength=n_times)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        # Every pair of co-active sources is an edge
+        pair_counts = counts * (counts - 1) // 2
+        indptr = np.concatenate(([0], np.cumsum(pair_counts)))
+        rows = np.empty(indptr[-1], dtype=np.int32)
+        cols = np.empty(indptr[-1], dtype=np.int32)
+        values = np.empty(indptr[-1], dtype=np.float32)
+
+        # Build all timepoints with the same number of active sources at once
+        for k in np.unique(counts[counts > 1]):
+            times = np.where(counts == k)[0]
+            members = s_ind[starts[times][:, None] + np.arange(k)]
+            first, second = np.triu_indices(k, 1)
+            dest = indptr[times][:, None] + np.arange(len(first))
+            rows[dest] = members[:, first]
+            cols[dest] = members[:, second]
+            values[dest] = activity[members[:, first], times[:, None]] + activity[members[:, second], times[:, None]]
+
+        return cls(rows, cols, values, indptr, n_nodes)
+
+    @property
+    def shape(self):
+        return (self.n_nodes, self.n_nodes, self.n_times)
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def n_times(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.cols.nbytes + self.values.nbytes + self.indptr.nbytes
+
+    def at(self, timepoint):
+        '''
+        Get the (rows, cols, values) of the edges active at a timepoint.
+        '''
+        lower, upper = self.indptr[int(timepoint)], self.indptr[int(timepoint) + 1]
+        return self.rows[lower:upper], self.cols[lower:upper], self.values[lower:upper]
+
+    def dense(self, timepoint):
+        '''
+        Get the edges at a timepoint as an (N, N) masked array where inactive
+        edges are masked.
+        '''
+        rows, cols, values = self.at(timepoint)
+        data = np.zeros((self.n_nodes, self.n_nodes), dtype=np.float32)
+        mask = np.ones((self.n_nodes, self.n_nodes), dtype=bool)
+        data[rows, cols] = values
+        mask[rows, cols] = False
+        return np.ma.masked_array(data, mask=mask)
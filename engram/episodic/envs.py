@@ -1,10 +1,15 @@
 from __future__ import division
 from __future__ import print_function
+import logging
+import pickle
+import zipfile
 import vispy
 import numpy as np
 import math
 
-def select(shader="separation",id=None, control_method='keyboard'):
+logger = logging.getLogger('visbrain')
+
+def select(shader="separation",id=None, control_method='keyboard', control_kwargs=None, stream=None):
     selection = {
         "separation": separation,
     }
@@ -15,20 +20,44 @@ def select(shader="separation",id=None, control_method='keyboard'):
     if (shader != 'separation'):
         return func()
     else:
-        return func(id,control_method)
+        return func(id,control_method,control_kwargs,stream)
 
 
 # ____________________________ CUSTOM ENVIRONMENTS ____________________________
 
-def separation(id,control_method):
+def separation(id,control_method,control_kwargs=None,stream=None):
 
     from .gui import Engram
+
+    kwargs = separation_objects(id)
+
+    vb = Engram(**kwargs,rotation=0.25,carousel_display_method='text',\
+                    control_method=control_method,control_kwargs=control_kwargs or {},\
+                    stream=stream)
+    vb.engram_control(template='B1',alpha=.02)
+    vb.engram_control(visible=False)
+    vb.rotate(custom=(180-45.0, 0.0))
+    vb.show()
+
+
+def separation_objects(id):
+    """Build the sources, connectivity and carousel metadata of an ID.
+
+    Shared by the interactive separation environment and the offline
+    renderer. Returns the keyword arguments of Engram.
+    """
+
     from visbrain.objects import RoiObj
     from .objects import SourceObj, ConnectObj
+    from .edges import SparseEdges
     from visbrain.io import download_file
+    from concurrent.futures import ThreadPoolExecutor
 
-    # Create an empty kwargs dictionnary :
-    kwargs = {}
+    # Read the ROI template file in the background while the data is
+    # prepared (the object itself is built on this thread)
+    templates = ThreadPoolExecutor(max_workers=1)
+    roi_read = templates.submit(read_template, 'aal')
+    templates.shutdown(wait=False)
 
     # ____________________________ DATA ____________________________
 
@@ -39,48 +68,9 @@ def separation(id,control_method):
     metadata = id.durations[0].metadata
     binary = id.durations[0].bins[0]
 
-    positions = metadata['stream_pattern']['positions']
-    assignments = metadata['stream_pattern']['hierarchy']
-
-    SPACING = 6 # In MNI coordinates
     INITIAL_DISTINCTIONS = []
 
-    n_dims = np.shape(assignments)[1]
-    existing_levels = []
-    intersection_matrices = {}
-    intersection_matrices['indices'] = np.empty([])
-    intersection_matrices['streams'] = np.empty([])
-    intersection_matrices['positions'] = np.empty([])
-    intersection_matrices['hierarchy_lookup'] = []
-
-    # Derive Intersection Matrix
-    for k, hierarchy in enumerate(assignments):
-        if '' not in hierarchy:
-            intersection = []
-            for level, v in enumerate(hierarchy):
-                    if len(intersection_matrices['hierarchy_lookup']) <= level:
-                        intersection_matrices['hierarchy_lookup'].append([])
-                        intersection_matrices['hierarchy_lookup'][level].extend([v])
-                    if v not in intersection_matrices['hierarchy_lookup'][level]:
-                        intersection_matrices['hierarchy_lookup'][level].extend([v])
-                    distinction = np.where(np.asarray(intersection_matrices['hierarchy_lookup'][level]) == v)[0][0]
-                    intersection.append(distinction)
-            if intersection:
-                intersection = np.expand_dims(np.array(intersection), axis=0)
-                pos = np.expand_dims(np.array(positions[k]), axis=0)
-                stream = np.expand_dims(np.array(metadata['all_streams'][k]), axis=0)
-                source_count = np.expand_dims(np.arange(np.array(sum(binary.nD_labels['1D']==metadata['all_streams'][k]))), axis=0)
-                if k is 0:
-                    intersection_matrices['indices'] = intersection
-                    intersection_matrices['streams'] = stream
-                    intersection_matrices['sources'] = source_count
-                    intersection_matrices['positions'] = pos
-                    
-                else:
-                    intersection_matrices['indices'] = np.append(intersection_matrices['indices'], intersection,axis=0)
-                    intersection_matrices['streams'] = np.append(intersection_matrices['streams'], stream,axis=0)
-                    intersection_matrices['sources'] = np.append(intersection_matrices['sources'],source_count+intersection_matrices['sources'][k-1][-1]+1,axis=0)
-                    intersection_matrices['positions'] = np.append(intersection_matrices['positions'], pos,axis=0)
+    intersection_matrices = carousel_metadata(metadata, binary)
 
     xyz = position_slicer(intersection_matrices,method=INITIAL_DISTINCTIONS,ignore_streams=True)
     
@@ -88,42 +78,17 @@ def separation(id,control_method):
     print('Calculating spike durations')
     TRAIL = 10
     TIMEPOINTS = 100000
-    spikes = binary.data.T[0:TIMEPOINTS].astype('float64')
-    one_array = np.where(spikes == 1)
-    if not not one_array:
-        lb_1 = one_array[0]-TRAIL
-        ub_1 = one_array[0]
-        lb_2 = one_array[0]
-        ub_2 = one_array[0]+TRAIL
-        for ii in range(len(lb_1)):
-            if ub_2[ii] > len(spikes):
-                ub_2[ii] = len(spikes)
-            if lb_1[ii] < 0:
-                lb_1[ii] = 0
-                    
-            spikes[lb_1[ii]:ub_1[ii],one_array[1][ii]] += np.linspace(0,1,ub_1[ii]-lb_1[ii])
-            spikes[lb_2[ii]:ub_2[ii],one_array[1][ii]] += np.linspace(1,0,ub_2[ii]-lb_2[ii])
-        
-    spikes = spikes.T
+    spikes = binary.trail(TRAIL=TRAIL, timepoints=TIMEPOINTS)
 
     N = xyz.shape[0]  # Number of electrodes
 
     text = ['S' + str(k) for k in range(N)]
     s_obj = SourceObj('SourceObj1', xyz, data=spikes,color='crimson', text=text,alpha=.5,
-                    edge_width=2., radius_min=1., radius_max=25.)
+                    edge_width=2., radius_min=1., radius_max=25., radius_window=2048)
 
     
-    connect = np.zeros((N, N,np.shape(spikes)[1]))
-    valid = np.empty((N, N,np.shape(spikes)[1]))
-    edges = np.arange(N)    
-
     print('Calculating connectivity')
-    for ind,activity in enumerate(spikes):
-        if ind < len(spikes):
-            edge_activity = spikes[ind+1:-1]
-            weight = edge_activity + activity
-            valid = ((edge_activity > 0) & (activity > 0)).astype('int')
-            connect[ind,ind+1:-1] = weight * valid
+    connect = SparseEdges.from_activity(spikes)
 
     umin = 0
     umax = np.max(spikes)
@@ -131,127 +96,151 @@ def separation(id,control_method):
     c_obj = ConnectObj('ConnectObj1', xyz, connect,color_by='strength',
                     dynamic=(.1, 1.), cmap='gnuplot', vmin=umin + .1,
                     vmax=umax - 1,line_width=0.1,
-                    clim=(umin, umax), antialias=True)
+                    clim=(umin, umax), antialias=True, incremental=True)
 
 
+    roi_read.result()
     r_obj = RoiObj('aal')
     # idx_rh = r_obj.where_is('Hippocampus (R)')
     # idx_lh = r_obj.where_is('Hippocampus (L)')
     # r_obj.select_roi(select=[idx_rh, idx_lh], unique_color=False, smooth=7, translucent=True)
 
-    vb = Engram(source_obj=s_obj,roi_obj=r_obj,connect_obj=c_obj,metadata=metadata,\
-                rotation=0.25,carousel_metadata=intersection_matrices,\
-                    carousel_display_method='text',control_method=control_method)
-    vb.engram_control(template='B1',alpha=.02)
-    vb.engram_control(visible=False)
-    vb.rotate(custom=(180-45.0, 0.0))
-    vb.show()
+    return dict(source_obj=s_obj,roi_obj=r_obj,connect_obj=c_obj,metadata=metadata,\
+                carousel_metadata=intersection_matrices)
+
+def read_template(name):
+    """Fetch and read the file of a visbrain ROI / volume template.
+
+    This is file work only (download when missing, then read every array), so
+    it can run off the main thread and leave the template warm for the visual
+    object built afterwards. Failures are logged, and the visual object
+    raises them again when it reads the template itself.
+    """
+    from visbrain.io import download_file
+    try:
+        with np.load(download_file(name + '.npz', astype='roi'), allow_pickle=True) as template:
+            for key in template.files:
+                template[key]
+    except (OSError, ValueError, zipfile.BadZipFile, pickle.UnpicklingError) as e:
+        logger.error("Could not read the %s template : %s" % (name, e))
+
+def carousel_metadata(metadata, binary):
+    """Derive the intersection matrices organizing streams in the carousel.
+
+    Each hierarchy level is factorized once over every stream: values are
+    numbered in order of first appearance, which gives hierarchy_lookup and
+    the indices of each stream. Streams with an empty level are left out.
+    """
+
+    positions = metadata['stream_pattern']['positions']
+    assignments = np.asarray(metadata['stream_pattern']['hierarchy'])
+
+    n_dims = np.shape(assignments)[1]
+    intersection_matrices = {}
+    intersection_matrices['indices'] = np.empty([])
+    intersection_matrices['streams'] = np.empty([])
+    intersection_matrices['positions'] = np.empty([])
+    intersection_matrices['hierarchy_lookup'] = []
+
+    kept = np.where(~(assignments == '').any(axis=1))[0]
+    if not len(kept) or not n_dims:
+        return intersection_matrices
+
+    # Derive Intersection Matrix
+    indices = np.empty((len(kept), n_dims), dtype=int)
+    for level in range(n_dims):
+        values, first, inverse = np.unique(assignments[kept, level], return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        intersection_matrices['hierarchy_lookup'].append(list(values[order]))
+        indices[:, level] = rank[np.ravel(inverse)]
+
+    # Sources of each stream, numbered consecutively across streams
+    streams = np.asarray(metadata['all_streams'])[kept]
+    counts = binary.channel_index.count(streams)
+    assert len(np.unique(counts)) == 1, "Every stream needs the same number of sources"
+
+    intersection_matrices['indices'] = indices
+    intersection_matrices['streams'] = streams
+    intersection_matrices['sources'] = np.arange(np.sum(counts)).reshape(len(streams), counts[0])
+    intersection_matrices['positions'] = np.asarray(positions)[kept]
+
+    return intersection_matrices
 
 def position_slicer(intersection_matrices, method=[],ignore_streams=True):
+    """Lay sources out on a grid per group of streams sharing the levels in method.
+
+    Groups are centred on the mean position of their streams. Each group (or
+    each stream of a group when ignore_streams is False) is a square grid of
+    sources, and the layout is rescaled to the canvas unless every level is
+    distinguished. Rows follow the group order, then stream, then source.
+    """
 
     SPACING = 1 # In MNI coordinates
     RESCALING = 100
-    X = []
-    Y = []
-    Z = []
-    # R = []
-    # G = []
-    # B = []
-    # W = []
 
     indices = np.copy(intersection_matrices['indices'])
-    positions = np.copy(intersection_matrices['positions'])
-    sources = np.copy(intersection_matrices['sources'])
+    positions = np.asarray(intersection_matrices['positions'])
+    sources = np.asarray(intersection_matrices['sources'])
 
+    # Levels not in method are merged
     dims = np.arange(np.shape(indices)[1])
-    dissim = (dims != method)
-    if method is []:
-        dim_to_remove = dims
-    else:
+    method = np.asarray(method)
+    if method.size in (1, len(dims)):
+        dissim = (dims != method)
         dim_to_remove = np.where(dissim)[0]
-    new_inds = indices
-    new_inds[:,dim_to_remove] = 0
-    groups, streams_in_groups,n_streams_in_group = np.unique(new_inds,axis=0,return_inverse=True,return_counts=True)
-    group_pos = np.empty((np.shape(groups)[0],np.shape(positions)[1]))
-    for ii,group in enumerate(groups):
-        group_indices = np.where(streams_in_groups==ii)[0]
-        group_pos[ii] = np.mean(positions[group_indices],axis=0)
-
-    for group, group_properties in enumerate(groups):
-        streams = np.squeeze(np.argwhere(np.all((new_inds-group_properties)==0, axis=1)))
-        n_sources_in_group = sources[streams].size
-
+        full = not dissim.any()
+    else:
+        # Lengths that do not broadcast never compared elementwise : only the
+        # first level is merged
+        dim_to_remove = [0]
+        full = False
+    indices[:,dim_to_remove] = 0
+    groups, streams_in_groups, n_streams_in_group = np.unique(indices,axis=0,return_inverse=True,return_counts=True)
+    streams_in_groups = np.ravel(streams_in_groups)
+
+    # Streams ordered by group, and the group mean positions
+    order = np.argsort(streams_in_groups, kind='stable')
+    first_stream = np.concatenate(([0], np.cumsum(n_streams_in_group)[:-1]))
+    group_pos = np.add.reduceat(positions[order], first_stream, axis=0)
+    group_pos = (group_pos / n_streams_in_group[:, np.newaxis].astype(group_pos.dtype)).astype(float)
+
+    # One row per source : its group, its stream rank in the group and its index in the stream
+    n_per_stream = np.shape(sources)[1]
+    group = np.repeat(streams_in_groups[order], n_per_stream)
+    stream = np.repeat(np.arange(len(order)) - first_stream[streams_in_groups[order]], n_per_stream)
+    source = np.tile(np.arange(n_per_stream), len(order))
+
+    with np.errstate(divide='ignore'):
         if ignore_streams:
-            n_sources_in_streams = np.asarray([np.arange(n_sources_in_group)])
+            # A single grid per group
+            n_sources_in_group = n_streams_in_group * n_per_stream
+            inds = stream * n_per_stream + source
+            side = np.ceil(np.sqrt(n_sources_in_group - 1)).astype(int)[group]
         else:
-            n_sources_in_streams = sources[streams]
-
-        for stream, source_inds in enumerate(n_sources_in_streams):
-            source_inds -= source_inds[0]
-            side = math.ceil((len(source_inds)-1)**(1./2.)) # (1./3.))
-            side_1 = SPACING * ((source_inds//(side)) - ((side-1)/2))
-            flatten = np.tile(0.,len(source_inds))
-            side_2 = SPACING * ((source_inds%side) - ((side-1)/2)) #SPACING * ((((source/n_sources_in_group)%(side**2))//side) - (side-1)/2)
-            
-            if ignore_streams:
-                X = np.append(X,group_pos[group][0] + side_1)
-                Y = np.append(Y,group_pos[group][1] + flatten)
-                Z = np.append(Z,group_pos[group][2] + side_2)
-            else:
-                X = np.append(X,group_pos[group][0] + flatten + (SPACING*stream))
-                Y = np.append(Y,group_pos[group][1] + side_1)
-                Z = np.append(Z,group_pos[group][2] + side_2)
-                
-            # R = np.append(R,np.tile(group/(len(groups)-1),len(source_inds)))
-            # G = np.append(G,np.tile(group/(len(groups)-1),len(source_inds)))
-            # B = np.append(B,np.tile(group/(len(groups)-1),len(source_inds)))
-            # W = np.append(W,np.tile(1.,len(source_inds))) # Opacity 
-
-    n_sources = sources.size
-
-    if isinstance(dissim, (bool)):
-        full = False
-    elif (dims != method).any():
-        full = False
+            inds = source
+            side = np.full(len(source), math.ceil((n_per_stream-1)**(1./2.)), dtype=int)
+        side_1 = SPACING * ((inds//side) - ((side-1)/2))
+        side_2 = SPACING * ((inds%side) - ((side-1)/2))
+
+    if ignore_streams:
+        X = group_pos[group, 0] + side_1
+        Y = group_pos[group, 1] + 0.
+        Z = group_pos[group, 2] + side_2
     else:
-        full = True
-
+        X = group_pos[group, 0] + 0. + (SPACING*stream)
+        Y = group_pos[group, 1] + side_1
+        Z = group_pos[group, 2] + side_2
 
+    xyz = np.c_[X, Y, Z]
 
     # Recenter (to canvas) unless all distinctions have been made
     if not full:
-        if len(np.unique(X)) > 1:
-            X = ((X - np.min(X))/(max(X) - min(X))) - .5
-        else:
-            X = 0
-        
-        X = RESCALING * X
-
-        if len(np.unique(Y)) > 1:
-            Y = ((Y - min(Y))/(max(Y) - min(Y))) - .5
-        else:
-            Y = 0
-        
-        Y = RESCALING * Y
-
-        if len(np.unique(Z)) > 1:
-            Z = ((Z - min(Z))/(max(Z) - min(Z))) - .5
-        else:
-            Z = 0
-
-        Z = RESCALING * Z
-
-    xyz = np.zeros((n_sources,3)).astype('float32')
-    # data = np.zeros(n_sources, [('a_color', np.float32, 4),
-    #                     ('a_rotation', np.float32, 4)])
-
-    xyz[:, 0] = X
-    xyz[:, 1] = Y
-    xyz[:, 2] = Z
-
-    # data['a_color'][:, 0] = R
-    # data['a_color'][:, 1] = G
-    # data['a_color'][:, 2] = B
-    # data['a_color'][:, 3] = W
+        low, high = xyz.min(axis=0), xyz.max(axis=0)
+        spread = high > low
+        xyz[:, spread] = ((xyz[:, spread] - low[spread])/(high[spread] - low[spread])) - .5
+        xyz[:, ~spread] = 0
+        xyz = RESCALING * xyz
 
-    return xyz # , data
\ No newline at end of file
+    return xyz.astype('float32')
@@ -8,7 +8,6 @@ BrainUserMethods: initialize functions for user interaction.
 """
 import logging
 import itertools
-import serial 
 import sys
 import time
 
@@ -20,6 +19,8 @@ from .interface import UiInit, UiElements, EngramShortcuts
 from .visuals import Visuals
 from .cbar import EngramCbar
 from .user import EngramUserMethods
+from .inputs import select as select_input
+from .profiler import FrameProfiler
 from visbrain._pyqt_module import _PyQtModule
 from visbrain.config import PROFILER, CONFIG
 
@@ -106,10 +107,22 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
         Information about how to display the source organization
     control_method: str
         How you would like to control the visualization. Default is keyboard
+        (see engraphy.inputs for 'IR_Distance', 'serial', 'replay',
+        'synthetic' and 'socket')
+    control_kwargs: dict
+        Arguments of the input backend (e.g. port, path or record)
+    stream: SpikeRing | ContRing | None
+        Ring buffer of a live recording. When given, the latest sample of the
+        stream is displayed instead of looping over the loaded data
+    profile: bool | False
+        Display the frame rate and per-stage timings over the canvas
+    profile_trace: bool | False
+        Keep every stage timing so that self.profiler.dump can write a trace
     """
 
     def __init__(self, bgcolor='black', verbose=None, **kwargs):
         """Init."""
+        self._t_start = time.perf_counter()  # For the time to first frame
         # ====================== PyQt creation ======================
         _PyQtModule.__init__(self, verbose=verbose, to_describe='view.wc',
                              icon='brain_icon.svg')
@@ -197,10 +210,12 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
         # Carousel Choice
         if 'carousel_choice' in kwargs.keys():
             self._carousel_choice = kwargs['carousel_choice']
-            self._prev_carousel_choice = kwargs['carousel_choice']
         else:
             self._carousel_choice = [0,0]
-            self._prev_carousel_choice = [0,0]
+        self._prev_carousel_choice = None # Force a layout update on the first frame
+
+        # Layouts for Every Carousel Option
+        self._cache_layouts()
 
         # Display Method
         self.update_carousel()
@@ -216,33 +231,24 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
         else:
             self.control_method = 'keyboard'
 
-        if self.control_method is 'IR_Distance':
-            self.ser = serial.Serial('/dev/cu.usbmodem144101')
-            self.use_distance = True
-        else:
-            self.ser = None
+        # Any backend feeds the same 'distance|command' stream
+        control_kwargs = kwargs.get('control_kwargs', {})
+        self.controller = select_input(self.control_method, **control_kwargs)
+        self.controller.start()
+        self.use_distance = self.control_method != 'keyboard'
+        # Stop the reader and flush its recording with the canvas
+        self.view.canvas.events.close.connect(lambda event: self.controller.close())
 
 
         self.prev_rotation = 0
 
-        def arduino_control(method='none'):
-            if self.ser is not None:
-                # Check Arduino inputs
-                try:
-                    b = self.ser.readline()         # read a byte string
-                    string_n = b.decode()  # decode byte string into Unicode  
-                    message = string_n.rstrip() # remove \n and \r
-                    messages = message.split('|')
-                    distance = messages[0]
-                    command = messages[1]
-                except:
-                    distance = 500
-                    command = 'NONE'
-
+        def arduino_control():
+            # Drain the background reader (never blocks on the device)
+            distance, commands = self.controller.poll()
 
-            if method == 'IR_Distance':
+            if distance is not None or commands:
 
-                if self.use_distance:
+                if self.use_distance and distance is not None:
                     THRESHOLD = 20 # cm
                     HEIGHT = 0
                     flt = float(distance)
@@ -258,122 +264,124 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
                         
                     
                 # Remote Option
+                for command in commands:
 
-                if command != 'NONE':
-                    print(command)
+                    if command != 'NONE':
+                        print(command)
 
-                if command == 'POWER':
-                    sys.exit()
+                    if command == 'POWER':
+                        self.controller.close()
+                        sys.exit()
 
-                if command == 'ST/REPT' and not self.use_distance:
-                    if self._carousel_choice[0] < (len(self._carousel_options_inds)-1):
-                        if self._carousel_choice[0] == 1:
-                            self._carousel_choice[0] = 3
+                    if command == 'ST/REPT' and not self.use_distance:
+                        if self._carousel_choice[0] < (len(self._carousel_options_inds)-1):
+                            if self._carousel_choice[0] == 1:
+                                self._carousel_choice[0] = 3
+                            else:
+                                self._carousel_choice[0] += 1
                         else:
-                            self._carousel_choice[0] += 1
-                    else:
-                        self._carousel_choice[0] = 0
-                    self._carousel_choice[1] = 0
+                            self._carousel_choice[0] = 0
+                        self._carousel_choice[1] = 0
                 
-                if command == 'EQ':
-                    if self.use_distance:
-                        self.use_distance = False
-                    else:
-                        self.use_distance = True
+                    if command == 'EQ':
+                        if self.use_distance:
+                            self.use_distance = False
+                        else:
+                            self.use_distance = True
 
-                if command == 'FUNC/STOP':
-                    if self._carousel_choice[1] < (len(self._carousel_options_inds[self._carousel_choice[0]])-1):
-                        self._carousel_choice[1] += 1
-                    else:
-                        self._carousel_choice[1] = 0
+                    if command == 'FUNC/STOP':
+                        if self._carousel_choice[1] < (len(self._carousel_options_inds[self._carousel_choice[0]])-1):
+                            self._carousel_choice[1] += 1
+                        else:
+                            self._carousel_choice[1] = 0
                 
-                if command == 'VOL+' or command == 'VOL-':
-                    if command == 'VOL+':
-                        self.view.wc.camera.distance -= 5000
-                    else: 
-                        self.view.wc.camera.distance += 5000
+                    if command == 'VOL+' or command == 'VOL-':
+                        if command == 'VOL+':
+                            self.view.wc.camera.distance -= 5000
+                        else: 
+                            self.view.wc.camera.distance += 5000
 
-                if command == 'UP':
-                    self.rotation += .25
+                    if command == 'UP':
+                        self.rotation += .25
 
-                elif command == 'DOWN':
-                    self.rotation -= .25
+                    elif command == 'DOWN':
+                        self.rotation -= .25
 
-                elif command == 'FAST BACK':
-                    if np.sign(self.timescaling) == 1:
-                        self.timescaling = -0.1
-                    else:
-                        self.timescaling -= 0.10
+                    elif command == 'FAST BACK':
+                        if np.sign(self.timescaling) == 1:
+                            self.timescaling = -0.1
+                        else:
+                            self.timescaling -= 0.10
 
-                elif command == 'FAST FORWARD':
-                    if np.sign(self.timescaling) == -1:
-                        self.timescaling = 0.1
-                    else:
-                        self.timescaling += 0.10
+                    elif command == 'FAST FORWARD':
+                        if np.sign(self.timescaling) == -1:
+                            self.timescaling = 0.1
+                        else:
+                            self.timescaling += 0.10
 
-                elif command == 'PAUSE':
-                    if self.timescaling == 0:
-                        print('PLAY')
-                        self.timescaling = self.default_timescaling
-                        self.rotation = self.prev_rotation
-                        self.displayed_time = self.time_cache
-                        self.time_cache = None
+                    elif command == 'PAUSE':
+                        if self.timescaling == 0:
+                            print('PLAY')
+                            self.timescaling = self.default_timescaling
+                            self.rotation = self.prev_rotation
+                            self.displayed_time = self.time_cache
+                            self.time_cache = None
 
-                    else:
-                        print('PAUSE')
-                        self.prev_rotation = self.rotation
-                        self.time_cache = self.displayed_time
-                        self.rotation = 0
-                        self.timescaling = 0
-                        self.paused = True
-
-                if self.paused == True:
-                    if command == 'FAST FORWARD':
-                        self.time_cache += .02
-                    elif command == 'FAST BACK':
-                        self.time_cache -= .02
+                        else:
+                            print('PAUSE')
+                            self.prev_rotation = self.rotation
+                            self.time_cache = self.displayed_time
+                            self.rotation = 0
+                            self.timescaling = 0
+                            self.paused = True
+
+                    if self.paused == True:
+                        if command == 'FAST FORWARD':
+                            self.time_cache += .02
+                        elif command == 'FAST BACK':
+                            self.time_cache -= .02
 
 
-                # Remote Numbers
-                if command == '0':
-                    self.view.wc.camera.azimuth = 0 
-                    self.view.wc.camera.elevation = 90
+                    # Remote Numbers
+                    if command == '0':
+                        self.view.wc.camera.azimuth = 0 
+                        self.view.wc.camera.elevation = 90
 
-                elif command == '1':
-                    self.view.wc.camera.azimuth = 0
-                    self.view.wc.camera.elevation = -90
+                    elif command == '1':
+                        self.view.wc.camera.azimuth = 0
+                        self.view.wc.camera.elevation = -90
 
-                elif command == '2':
-                    self.view.wc.camera.azimuth = 90 
-                    self.view.wc.camera.elevation = 0
+                    elif command == '2':
+                        self.view.wc.camera.azimuth = 90 
+                        self.view.wc.camera.elevation = 0
 
-                elif command == '3':
-                    self.view.wc.camera.azimuth = -90 
-                    self.view.wc.camera.elevation = 0
+                    elif command == '3':
+                        self.view.wc.camera.azimuth = -90 
+                        self.view.wc.camera.elevation = 0
 
-                elif command == '4':
-                    self.view.wc.camera.azimuth = 0 
-                    self.view.wc.camera.elevation = 0
+                    elif command == '4':
+                        self.view.wc.camera.azimuth = 0 
+                        self.view.wc.camera.elevation = 0
 
-                elif command == '5':
-                    self.view.wc.camera.azimuth = 180 
-                    self.view.wc.camera.elevation = 0
+                    elif command == '5':
+                        self.view.wc.camera.azimuth = 180 
+                        self.view.wc.camera.elevation = 0
 
-                elif command == '6':
-                    self.view.wc.camera.azimuth = 45 
-                    self.view.wc.camera.elevation = 30
+                    elif command == '6':
+                        self.view.wc.camera.azimuth = 45 
+                        self.view.wc.camera.elevation = 30
 
-                elif command == '7':
-                    self.view.wc.camera.azimuth = 45 
-                    self.view.wc.camera.elevation = -30
+                    elif command == '7':
+                        self.view.wc.camera.azimuth = 45 
+                        self.view.wc.camera.elevation = -30
 
-                elif command == '8':
-                    self.view.wc.camera.azimuth = -45 
-                    self.view.wc.camera.elevation = 30
+                    elif command == '8':
+                        self.view.wc.camera.azimuth = -45 
+                        self.view.wc.camera.elevation = 30
 
-                elif command == '9':
-                    self.view.wc.camera.azimuth = -45 
-                    self.view.wc.camera.elevation = -30
+                    elif command == '9':
+                        self.view.wc.camera.azimuth = -45 
+                        self.view.wc.camera.elevation = -30
 
         
         # ====================== Timer Creation ======================
@@ -387,27 +395,56 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
 
         self.paused = False
 
+        # Live ring buffer (see engram.declarative.stream) replacing playback
+        self.stream = kwargs.get('stream', None)
+
+        # Per-stage frame timings (see engraphy.profiler)
+        self.profiler = FrameProfiler(trace=kwargs.get('profile_trace', False))
+        self.show_profile = kwargs.get('profile', False)
+        stage = self.profiler.stage
+
         def on_timer(*args, **kwargs): 
+            self.profiler.start_frame()
+
+            # Live : show the latest complete sample of the stream
+            if self.stream is not None:
+                timepoint = self.stream.latest()
+                self.displayed_time = max(timepoint, 0)/self.stream.fs
+                values = self.stream.column(timepoint)
+                with stage('radius'):
+                    for source in self.sources:
+                        source._update_live(values, vmax=self.stream.vmax)
+                with stage('connect'):
+                    for connect in self.connect:
+                        connect._update_live(values)
 
             # Change Source Radii and Connectivity Values
-            if self.time_cache is None:
-                time_inc = (args[0].dt*self.timescaling)
-                self.displayed_time = self.loop_shift+(self.displayed_time + time_inc)%((np.shape(self.sources[0].data)[1]/self.metadata['fs'])-self.loop_shift)
             else:
-                self.displayed_time = self.loop_shift+(self.time_cache)%((np.shape(self.sources[0].data)[1]/self.metadata['fs'])-self.loop_shift)
+                if self.time_cache is None:
+                    time_inc = (args[0].dt*self.timescaling)
+                    self.displayed_time = self.loop_shift+(self.displayed_time + time_inc)%((np.shape(self.sources[0].data)[1]/self.metadata['fs'])-self.loop_shift)
+                else:
+                    self.displayed_time = self.loop_shift+(self.time_cache)%((np.shape(self.sources[0].data)[1]/self.metadata['fs'])-self.loop_shift)
             
-            timepoint = int(self.displayed_time*self.metadata['fs'])
-            for source in self.sources:
-                source._update_radius(timepoint=timepoint)
-            for connect in self.connect:
-                connect._update_time(timepoint=timepoint)
-
-            arduino_control(self.control_method)
-
-            self.update_target_positions()
-            self.update_carousel()
-            self.update_visibility()
-            self._prev_carousel_choice = self._carousel_choice
+                timepoint = int(self.displayed_time*self.metadata['fs'])
+                with stage('radius'):
+                    for source in self.sources:
+                        source._update_radius(timepoint=timepoint)
+                with stage('connect'):
+                    for connect in self.connect:
+                        connect._update_time(timepoint=timepoint)
+
+            with stage('input'):
+                arduino_control()
+
+            # Only swap layouts when the carousel choice changes
+            with stage('layout'):
+                if self._carousel_choice != self._prev_carousel_choice:
+                    self.update_target_positions()
+                    self.update_visibility()
+            with stage('carousel'):
+                self.update_carousel()
+            self._prev_carousel_choice = list(self._carousel_choice)
 
             if len(self._userdistance) > 2:
                 self._userdistance = [-1]
@@ -423,17 +460,33 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
             self._time.pos = (49)*self.view.canvas.size[0] // 50, (19)*self.view.canvas.size[1] // 20
             self._time.update()
 
+            # Update Frame Timings Display
+            if self.show_profile:
+                p_str = self.profiler.text()
+                if not hasattr(self, '_profile'):
+                    self._profile = Text(p_str, parent=self.view.canvas.scene, color='white')
+                else:
+                    self._profile.text = p_str
+                self._profile.visible = True
+                self._profile.anchors = ('left','bottom')
+                self._profile.font_size = self.view.canvas.size[1] // 300
+                self._profile.pos = self.view.canvas.size[0] // 50, (19)*self.view.canvas.size[1] // 20
+                self._profile.update()
+            elif hasattr(self, '_profile'):
+                self._profile.visible = False
+
             # Ease to New Positions if Triggered
-            if self.ease_xyz:
-                self.ease_xyz = False
-                for source in self.sources:
-                    out = source._ease_to_target_position()
-                    if out:
-                        self.ease_xyz = True
-                for connect in self.connect:
-                    out = connect._ease_to_target_position()
-                    if out:
-                        self.ease_xyz = True
+            with stage('easing'):
+                if self.ease_xyz:
+                    self.ease_xyz = False
+                    for source in self.sources:
+                        out = source._ease_to_target_position()
+                        if out:
+                            self.ease_xyz = True
+                    for connect in self.connect:
+                        out = connect._ease_to_target_position()
+                        if out:
+                            self.ease_xyz = True
             
             # if hasattr(self.view.wc, 'camera'):
             #     diff_az = self.target_azimuth - self.view.wc.camera.azimuth
@@ -475,6 +528,22 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
         self._app_timer = app.Timer(**kw)
         self._app_timer.start()
 
+        # Time the scene drawing triggered by canvas.update()
+        def on_draw_start(event):
+            self._draw_start = time.perf_counter()
+
+        def on_draw_end(event):
+            if hasattr(self, '_draw_start'):
+                self.profiler.add('draw', self._draw_start,
+                                  time.perf_counter() - self._draw_start)
+            if self._t_start is not None:
+                logger.info("Time to first frame : %.3fs" % (
+                    time.perf_counter() - self._t_start))
+                self._t_start = None
+
+        self.view.canvas.events.draw.connect(on_draw_start, position='first')
+        self.view.canvas.events.draw.connect(on_draw_end, position='last')
+
         # ====================== Ui interactions ======================
         UiElements.__init__(self)  # GUI interactions
         PROFILER("Ui interactions")
@@ -526,21 +595,49 @@ class Engram(_PyQtModule, UiInit, UiElements, Visuals, EngramCbar,
         # Colorbar :
         self._fcn_menu_disp_cbar()
 
+    def closeEvent(self, event):
+        """Stop the control device when the window is closed."""
+        self.controller.close()
+        super().closeEvent(event)
+
+    def _cache_layouts(self):
+        """Compute the source positions of every carousel option once."""
+        self._layouts = {}
+        if 'indices' not in self.carousel_metadata:
+            return
+
+        for n_choices, options in enumerate(self._carousel_options_inds):
+            ignore_streams = self._ignores_streams(n_choices)
+            for option in options:
+                choice = option - 1 # Shift to Account for "None"
+                key = (tuple(choice), ignore_streams)
+                xyz = position_slicer(self.carousel_metadata,method=choice,ignore_streams=ignore_streams)
+                self._layouts[key] = np.asarray(xyz, dtype=np.float32)
+        PROFILER("Carousel layouts", level=1)
+
+    @staticmethod
+    def _ignores_streams(n_choices):
+        """Streams are only separated for the two deepest carousel levels."""
+        return not (n_choices == 2 or n_choices == 3)
+
     def update_target_positions(self):
         n_choices = self._carousel_choice[0]
         which_choice = self._carousel_choice[1]
         choice = self._carousel_options_inds[n_choices][which_choice] - 1 # Shift to Account for "None"
 
-        if self._carousel_choice[0] == 2 or self._carousel_choice[0] == 3:
-            self.ignore_streams = False
-        else:
-            self.ignore_streams = True
-        
-        xyz = position_slicer(self.carousel_metadata,method=choice,ignore_streams=self.ignore_streams)
+        self.ignore_streams = self._ignores_streams(n_choices)
+
+        key = (tuple(choice), self.ignore_streams)
+        if key not in self._layouts:
+            self._layouts[key] = np.asarray(position_slicer(self.carousel_metadata,method=choice,
+                                            ignore_streams=self.ignore_streams), dtype=np.float32)
+        xyz = self._layouts[key]
+
+        # Objects ease in place, so hand them a copy of the cached layout
         for source in self.sources:
-            source._update_target_position(xyz=xyz)
+            source._update_target_position(xyz=xyz.copy())
         for connect in self.connect:
-            connect._update_target_position(nodes=xyz)
+            connect._update_target_position(nodes=xyz.copy())
 
         self.ease_xyz = True
 
@@ -0,0 +1,318 @@
+"""Input devices controlling the Engram carousel and playback.
+
+Every backend feeds the same 'distance|command' stream that the Arduino
+sends, so the GUI does not depend on where its input comes from.
+
+InputBackend: base class queueing parsed lines for the GUI timer.
+KeyboardInput: no device, commands are only pushed programmatically.
+SerialInput: read Arduino sensor lines (or a pty) on a background thread.
+ReplayInput: replay a session captured with the record option.
+SyntheticInput: generate a sensor sweep and remote commands.
+SocketInput: read lines sent as UDP datagrams to a local port.
+"""
+import collections
+import logging
+import math
+import random
+import socket
+import threading
+import time
+
+logger = logging.getLogger('visbrain')
+
+DEFAULT_PORT = '/dev/cu.usbmodem144101'
+
+
+class InputBackend(threading.Thread):
+    """Queue 'distance|command' lines read on a background thread.
+
+    Subclasses implement :meth:`_readline`, which blocks until a line is
+    available and returns it as a byte string (or None to stop). Lines are
+    parsed on a daemon thread so that a slow or silent device never blocks
+    rendering. The GUI timer calls :meth:`poll` to get the latest new
+    distance and the commands received since the previous poll.
+
+    Parameters
+    ----------
+    record : string | None
+        Path of a file where every received line is written along with its
+        arrival time, for deterministic replay with :class:`ReplayInput`.
+    """
+
+    def __init__(self, record=None):
+        """Init."""
+        threading.Thread.__init__(self, name=type(self).__name__, daemon=True)
+        self._distance = collections.deque(maxlen=1)  # Latest unread reading
+        self._commands = collections.deque()  # append / popleft are atomic
+        self._running = True
+        self._t0 = time.perf_counter()
+        self._record = open(record, 'w') if record is not None else None
+        self._record_lock = threading.Lock()  # Written by the reader, closed by the GUI
+
+    def run(self):
+        """Read and parse lines until the input is closed."""
+        while self._running:
+            try:
+                line = self._readline()
+            except Exception as e:
+                if self._running:
+                    logger.error("%s stopped : %s" % (self.name, e))
+                break
+            if line is None:
+                break
+            self._parse(line)
+
+    def _readline(self):
+        """Get the next line as a byte string, or None to stop."""
+        raise NotImplementedError()
+
+    def _parse(self, line):
+        """Parse a 'distance|command' byte string."""
+        if isinstance(line, bytes):
+            line = line.decode(errors='ignore')
+        line = line.rstrip()
+        messages = line.split('|')
+        if len(messages) < 2:
+            return
+        received = time.perf_counter()
+        with self._record_lock:
+            if self._record is not None:
+                self._record.write('%.6f\t%s\n' % (received - self._t0, line))
+        try:
+            self._distance.append(float(messages[0]))
+        except ValueError:
+            pass
+        if messages[1] != 'NONE':
+            self._commands.append((received, messages[1]))
+
+    def push(self, command, distance=None):
+        """Queue a command (and distance) as if the device had sent it."""
+        self._parse('%s|%s' % ('' if distance is None else distance, command))
+
+    def poll(self, stamps=False):
+        """Get the latest distance and the commands received since the last
+        poll. The distance is None when no reading arrived since then.
+
+        With stamps, commands are returned as (arrival time, command) pairs,
+        arrival times being :func:`time.perf_counter` values.
+        """
+        commands = []
+        while self._commands:
+            stamped = self._commands.popleft()
+            commands.append(stamped if stamps else stamped[1])
+        try:
+            distance = self._distance.popleft()
+        except IndexError:
+            distance = None
+        return distance, commands
+
+    def close(self, timeout=2.):
+        """Stop reading, wait for the reader thread and close the recording.
+
+        Parameters
+        ----------
+        timeout : float | 2.
+            Maximum time (in seconds) to wait for a pending read.
+        """
+        self._running = False
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+        with self._record_lock:
+            if self._record is not None:
+                self._record.close()
+                self._record = None
+
+
+class KeyboardInput(InputBackend):
+    """Backend without a device.
+
+    The keyboard is handled by the canvas shortcuts, so this backend only
+    delivers commands given to :meth:`push`.
+    """
+
+    def run(self):
+        """Nothing to read."""
+        pass
+
+
+class SerialInput(InputBackend):
+    """Read lines from a serial device.
+
+    Any path opened by pyserial works, including the slave side of a pty
+    (e.g. from ``socat -d -d pty,raw,echo=0 pty,raw,echo=0``) to emulate the
+    Arduino locally.
+
+    Parameters
+    ----------
+    port : string | '/dev/cu.usbmodem144101'
+        Serial port of the device.
+    baudrate : int | 9600
+        Baud rate of the device.
+    timeout : float | 1.
+        Read timeout (in seconds) so the thread can be stopped.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, baudrate=9600, timeout=1., **kwargs):
+        """Init."""
+        InputBackend.__init__(self, **kwargs)
+        import serial
+        self._serial = serial.Serial(port, baudrate=baudrate, timeout=timeout)
+
+    def _readline(self):
+        line = self._serial.readline()
+        return line if line else b''
+
+    def close(self, **kwargs):
+        """Stop reading and close the serial port."""
+        InputBackend.close(self, **kwargs)
+        self._serial.close()
+
+
+class ReplayInput(InputBackend):
+    """Replay a session captured with the record option of a backend.
+
+    Parameters
+    ----------
+    path : string
+        Recorded file, one 'time<TAB>distance|command' line per reading.
+    speed : float | 1.
+        Playback speed. Use 0. to deliver every line without waiting.
+    loop : bool | False
+        Restart from the beginning once the recording ends.
+    """
+
+    def __init__(self, path, speed=1., loop=False, **kwargs):
+        """Init."""
+        InputBackend.__init__(self, **kwargs)
+        with open(path) as f:
+            self._lines = [line.rstrip('\n').split('\t', 1) for line in f if '\t' in line]
+        self._lines = [(float(t), line) for t, line in self._lines]
+        self.speed = speed
+        self.loop = loop
+        self._index = 0
+        self._start = None
+
+    def _readline(self):
+        if self._index == len(self._lines):
+            if not self.loop or not self._lines:
+                return None
+            self._index, self._start = 0, None
+        t, line = self._lines[self._index]
+        self._index += 1
+
+        if self._start is None:
+            self._start = time.perf_counter() - (t / self.speed if self.speed else 0.)
+        if self.speed:
+            wait = self._start + t / self.speed - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        return line
+
+
+class SyntheticInput(InputBackend):
+    """Generate a sensor stand-in.
+
+    The distance sweeps back and forth over range_cm so every carousel
+    level is visited, and commands are drawn at random.
+
+    Parameters
+    ----------
+    rate : float | 20.
+        Readings per second.
+    period : float | 10.
+        Duration (in seconds) of one sweep back and forth.
+    range_cm : tuple | (0., 80.)
+        Distances covered by the sweep.
+    commands : list | None
+        Commands to draw from. None only sends distances.
+    command_rate : float | 0.5
+        Mean number of commands per second.
+    duration : float | None
+        Stop after this many seconds. None runs until closed.
+    seed : int | None
+        Seed of the command draws.
+    """
+
+    def __init__(self, rate=20., period=10., range_cm=(0., 80.), commands=None,
+                 command_rate=.5, duration=None, seed=None, **kwargs):
+        """Init."""
+        InputBackend.__init__(self, **kwargs)
+        self.rate = rate
+        self.period = period
+        self.range_cm = range_cm
+        self.commands = list(commands) if commands is not None else []
+        self.command_rate = command_rate
+        self.duration = duration
+        self._random = random.Random(seed)
+        self._n = 0
+
+    def _readline(self):
+        t = self._n / self.rate
+        if self.duration is not None and t >= self.duration:
+            return None
+        self._n += 1
+        time.sleep(1. / self.rate)
+
+        low, high = self.range_cm
+        distance = low + (high - low) * .5 * (1 - math.cos(2 * math.pi * t / self.period))
+        command = 'NONE'
+        if self.commands and self._random.random() < self.command_rate / self.rate:
+            command = self._random.choice(self.commands)
+        return '%.1f|%s' % (distance, command)
+
+
+class SocketInput(InputBackend):
+    """Read lines sent as UDP datagrams to a local port.
+
+    Parameters
+    ----------
+    host : string | '127.0.0.1'
+        Address to bind.
+    port : int | 5005
+        Port to bind.
+    timeout : float | 1.
+        Receive timeout (in seconds) so the thread can be stopped.
+    """
+
+    def __init__(self, host='127.0.0.1', port=5005, timeout=1., **kwargs):
+        """Init."""
+        InputBackend.__init__(self, **kwargs)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(timeout)
+
+    def _readline(self):
+        try:
+            return self._socket.recv(1024)
+        except socket.timeout:
+            return b''
+
+    def close(self, **kwargs):
+        """Stop reading and close the socket."""
+        InputBackend.close(self, **kwargs)
+        self._socket.close()
+
+
+def select(method='keyboard', **kwargs):
+    """Create the input backend of a control method.
+
+    Parameters
+    ----------
+    method : string | 'keyboard'
+        One of 'keyboard', 'IR_Distance' (the Arduino sensor), 'serial',
+        'replay', 'synthetic' or 'socket'.
+    kwargs : dict | {}
+        Arguments of the backend, including record.
+    """
+    selection = {
+        'keyboard': KeyboardInput,
+        'IR_Distance': SerialInput,
+        'serial': SerialInput,
+        'replay': ReplayInput,
+        'synthetic': SyntheticInput,
+        'socket': SocketInput,
+    }
+    if method not in selection:
+        raise ValueError("Unknown control method %s, use one of %s" % (
+            method, ', '.join(selection)))
+    return selection[method](**kwargs)
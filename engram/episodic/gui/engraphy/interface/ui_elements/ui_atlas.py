@@ -86,12 +86,9 @@ class UiAtlas(object):
         #######################################################################
         #                           CROSS-SECTIONS
         #######################################################################
-        # Set (min, max) for sliders :
-        self._fcn_crossec_sl_limits()
-        # Sagittal, coronal and axial slider :
-        self._csSagit.setValue(self.cross_sec._bgd._sagittal)
-        self._csCoron.setValue(self.cross_sec._bgd._coronal)
-        self._csAxial.setValue(self.cross_sec._bgd._axial)
+        # Sliders are set once the cross-sections are loaded :
+        if self._is_loaded('cross_sec'):
+            self._fcn_crossec_loaded()
         self._csSagit.sliderMoved.connect(self._fcn_crossec_move)
         self._csCoron.sliderMoved.connect(self._fcn_crossec_move)
         self._csAxial.sliderMoved.connect(self._fcn_crossec_move)
@@ -101,7 +98,8 @@ class UiAtlas(object):
         self._csLevel.currentIndexChanged.connect(self._fcn_crossec_change)
         self._csInterp.currentIndexChanged.connect(self._fcn_crossec_interp)
         # Visibility :
-        self._sec_grp.setChecked(self.cross_sec.visible_obj)
+        self._sec_grp.setChecked(self._is_loaded('cross_sec') and
+                                 self.cross_sec.visible_obj)
         self._sec_grp.clicked.connect(self._fcn_crossec_viz)
         self._fcn_crossec_viz()
 
@@ -116,10 +114,13 @@ class UiAtlas(object):
         # Cmap :
         cmaps = list(VOLUME_CMAPS.keys())
         self._volCmap.addItems(cmaps)
-        self._volCmap.setCurrentIndex(cmaps.index(self.volume.cmap))
+        # Default colormap of VolumeObj until the volume is loaded :
+        cmap = self.volume.cmap if self._is_loaded('volume') else 'OpaqueGrays'
+        self._volCmap.setCurrentIndex(cmaps.index(cmap))
         self._volCmap.currentIndexChanged.connect(self._fcn_vol_cmap)
         # Visibility :
-        self._vol_grp.setChecked(self.volume.visible_obj)
+        self._vol_grp.setChecked(self._is_loaded('volume') and
+                                 self.volume.visible_obj)
         self._vol_grp.clicked.connect(self._fcn_vol_visible)
         self._fcn_vol_visible()
         # Threshold :
@@ -328,6 +329,14 @@ class UiAtlas(object):
         self._csCoron.setMaximum(self.cross_sec._vol.shape[1] - 1)
         self._csAxial.setMaximum(self.cross_sec._vol.shape[2] - 1)
 
+    def _fcn_crossec_loaded(self):
+        """Set the sliders of newly loaded cross-sections."""
+        self._fcn_crossec_sl_limits()
+        # Sagittal, coronal and axial slider :
+        self._csSagit.setValue(self.cross_sec._bgd._sagittal)
+        self._csCoron.setValue(self.cross_sec._bgd._coronal)
+        self._csAxial.setValue(self.cross_sec._bgd._axial)
+
     def _fcn_crossec_move(self, *args, update=False):
         """Trigged when a slider move."""
         # Get center position :
@@ -96,20 +96,22 @@ class UiMenu(HelpMenu):
     def _fcn_menu_disp_vol(self):
         """Display/hide the volume."""
         viz = self.menuDispVol.isChecked()
-        # Set volume visible/hide :
-        self.volume.visible_obj = viz
+        # Set volume visible/hide (a hidden volume is loaded once shown) :
+        if viz or self._is_loaded('volume'):
+            self.volume.visible_obj = viz
         self._vol_grp.setChecked(viz)
         self._fcn_menu_set_object(2)
 
     def _fcn_menu_disp_crossec(self):
         """Display/hide the Cross-sections."""
         viz = self.menuDispCrossec.isChecked()
-        # Set cross-sections visible/hide :
+        # Set cross-sections visible/hide (loaded once shown) :
         self._sec_grp.setChecked(viz)
-        self.cross_sec.visible_obj = viz
+        if viz or self._is_loaded('cross_sec'):
+            self.cross_sec.visible_obj = viz
+            self._fcn_crossec_sl_limits()
         # Disable split view if not visible :
         self._objsPage.setCurrentIndex(int(viz))
-        self._fcn_crossec_sl_limits()
         self._fcn_menu_set_object(3)
 
     def _fcn_menu_disp_sources(self):
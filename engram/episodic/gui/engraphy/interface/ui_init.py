@@ -50,6 +50,7 @@ class EngramShortcuts(object):
                    ('l', 'Revolve carousel right'),
                    ('k', 'Revolve carousel down'),
                    ('j', 'Revolve carousel left'),
+                   ('f', 'Display / hide frame timings'),
                    ]
 
         # Add shortcuts to EngramCanvas :
@@ -80,6 +81,10 @@ class EngramShortcuts(object):
             elif event.text == 'a':
                 self.cbqt._fcn_cb_autoscale()
 
+            # Frame timings overlay :
+            elif event.text == 'f':
+                self.show_profile = not self.show_profile
+
 
             elif event.text in ['i','j','k','l']:
                 if event.text in ['i']:
@@ -100,7 +105,7 @@ class EngramShortcuts(object):
                 self.update_target_positions()
                 self.update_carousel()
                 self.update_visibility()
-                self._prev_carousel_choice = self._carousel_choice
+                self._prev_carousel_choice = list(self._carousel_choice)
 
         @canvas.events.mouse_release.connect
         def on_mouse_release(event):
@@ -0,0 +1,127 @@
+"""Frame-time profiling of the Engram timer loop.
+
+FrameProfiler: per-stage timings over a rolling window of frames, with a
+text summary for the on-canvas overlay and a trace dump.
+"""
+import contextlib
+import json
+import time
+
+import numpy as np
+
+
+class FrameProfiler(object):
+    """Record how long each stage of a frame takes.
+
+    Durations are kept in one ring buffer per stage, holding the last
+    window frames, so percentiles reflect the current behaviour of the
+    visualizer rather than its whole history.
+
+    Parameters
+    ----------
+    window : int | 300
+        Number of frames used for the statistics.
+    trace : bool | False
+        Also keep every timed stage so that :meth:`dump` can write a trace
+        file (chrome://tracing / Perfetto JSON format).
+    max_events : int | 1000000
+        Maximum number of traced stages.
+    """
+
+    def __init__(self, window=300, trace=False, max_events=1000000):
+        """Init."""
+        self.window = window
+        self.trace = trace
+        self.max_events = max_events
+        self.enabled = True
+        self._durations = {}
+        self._counts = {}
+        self._events = []
+        self._frame_start = None
+        self._frame_times = np.full(window, np.nan)
+        self._n_frames = 0
+        self._t0 = time.perf_counter()
+
+    def start_frame(self):
+        """Mark the beginning of a frame."""
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self._frame_times[self._n_frames % self.window] = now - self._frame_start
+            self._n_frames += 1
+        self._frame_start = now
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one stage of the current frame."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter() - start)
+
+    def add(self, name, start, duration):
+        """Record a stage that started at start (perf_counter) and lasted
+        duration seconds."""
+        if name not in self._durations:
+            self._durations[name] = np.full(self.window, np.nan)
+            self._counts[name] = 0
+        self._durations[name][self._counts[name] % self.window] = duration
+        self._counts[name] += 1
+        if self.trace and len(self._events) < self.max_events:
+            self._events.append((name, start - self._t0, duration))
+
+    @property
+    def stages(self):
+        """Names of the recorded stages, in order of first appearance."""
+        return list(self._durations)
+
+    @property
+    def fps(self):
+        """Frames per second over the window."""
+        frame_time = np.nanmean(self._frame_times) if self._n_frames else np.nan
+        return 1. / frame_time if frame_time > 0 else np.nan
+
+    def percentile(self, name, q):
+        """Get the q-th percentile of a stage duration (in seconds)."""
+        durations = self._durations[name]
+        return np.nanpercentile(durations, q) if self._counts[name] else np.nan
+
+    def summary(self):
+        """Get the p50, p99 and max duration (in seconds) of every stage."""
+        summary = {}
+        for name, durations in self._durations.items():
+            p50, p99 = np.nanpercentile(durations, [50, 99])
+            summary[name] = {'p50': float(p50), 'p99': float(p99),
+                             'max': float(np.nanmax(durations)),
+                             'count': self._counts[name]}
+        return summary
+
+    def text(self):
+        """Get the overlay text: FPS, then p50 / p99 (in ms) per stage."""
+        lines = ['{:.1f} FPS'.format(self.fps)]
+        for name, stats in self.summary().items():
+            lines.append('{} {:.2f} / {:.2f} ms'.format(
+                name, 1e3 * stats['p50'], 1e3 * stats['p99']))
+        return '\n'.join(lines)
+
+    def reset(self):
+        """Forget every recorded duration and traced stage."""
+        self.__init__(window=self.window, trace=self.trace, max_events=self.max_events)
+
+    def dump(self, path):
+        """Write the traced stages and the summary to a JSON trace file.
+
+        Parameters
+        ----------
+        path : string
+            Output file. It can be opened in chrome://tracing or Perfetto.
+        """
+        events = [{'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                   'ts': 1e6 * start, 'dur': 1e6 * duration}
+                  for name, start, duration in self._events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': {'fps': float(self.fps), 'stages': self.summary()}}, f)
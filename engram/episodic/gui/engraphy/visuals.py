@@ -1,6 +1,8 @@
 """The BaseVisual class thath initialize all visual elements."""
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from PyQt5 import QtCore, QtWidgets
 from vispy import scene
 import vispy.visuals.transforms as vist
 
@@ -12,6 +14,8 @@ from visbrain.objects import (CombineTimeSeries, CombinePictures,
                               CrossSecObj)
 from visbrain.config import PROFILER
 
+from ...envs import read_template
+
 logger = logging.getLogger('visbrain')
 
 
@@ -32,6 +36,18 @@ class Visuals(object):
         logger.debug("Engram rescaled " + str([self._gl_scale] * 3))
         PROFILER("Root node", level=1)
 
+        # Template files are read on a background thread, while the visual
+        # objects are always built here on the main thread. The default ROI
+        # file is read while the other objects are built. The volume and
+        # cross-sections are hidden by default, so they are only created on
+        # first use.
+        self._templates = ThreadPoolExecutor(max_workers=1)
+        self._template_reads = {}
+        if kwargs.get('roi_obj', None) is None:
+            self._read_template('brodmann')
+        self._volume = kwargs.get('vol_obj', None)
+        self._cross_sec = kwargs.get('cross_sec_obj', None)
+
         # ========================= SOURCES =========================
         self.sources = CombineSources(kwargs.get('source_obj', None))
         if self.sources.name is None:
@@ -73,17 +89,14 @@ class Visuals(object):
 
         # ========================= VOLUME =========================
         # ----------------- Volume -----------------
-        if kwargs.get('vol_obj', None) is None:
-            self.volume = VolumeObj('brodmann')
-            self.volume.visible_obj = False
+        if self._is_loaded('volume'):
+            self._attach_volume()
+            PROFILER("Volume object", level=1)
         else:
-            self.volume = kwargs.get('vol_obj')
-        if self.volume.name not in self.volume.list():
-            self.volume.save(tmpfile=True)
-        self.volume.parent = self._vbNode
-        PROFILER("Volume object", level=1)
+            PROFILER("Volume object (deferred)", level=1)
         # ----------------- ROI -----------------
         if kwargs.get('roi_obj', None) is None:
+            self._wait_template('brodmann')
             self.roi = RoiObj('brodmann')
             self.roi.visible_obj = False
         else:
@@ -93,18 +106,11 @@ class Visuals(object):
         self.roi.parent = self._vbNode
         PROFILER("ROI object", level=1)
         # ----------------- Cross-sections -----------------
-        if kwargs.get('cross_sec_obj', None) is None:
-            self.cross_sec = CrossSecObj('brodmann')
+        if self._is_loaded('cross_sec'):
+            self._attach_cross_sec()
+            PROFILER("Cross-sections object", level=1)
         else:
-            self.cross_sec = kwargs.get('cross_sec_obj')
-        if self.cross_sec.name not in self.cross_sec.list():
-            self.cross_sec.save(tmpfile=True)
-        self.cross_sec.visible_obj = False
-        self.cross_sec.text_size = 2.
-        self.cross_sec.parent = self._csView.wc.scene
-        self._csView.camera = self.cross_sec._get_camera()
-        self.cross_sec.set_shortcuts_to_canvas(self._csView)
-        PROFILER("Cross-sections object", level=1)
+            PROFILER("Cross-sections object (deferred)", level=1)
 
         # ========================= ENGRAM =========================
         if kwargs.get('engram_obj', None) is None:
@@ -119,3 +125,64 @@ class Visuals(object):
 
         # Add XYZ axis (debugging : x=red, y=green, z=blue)
         # scene.visuals.XYZAxis(parent=self._vbNode)
+
+    ###########################################################################
+    #                            DEFERRED OBJECTS
+    ###########################################################################
+    @property
+    def volume(self):
+        """Volume object, created the first time it is used."""
+        if self._volume is None:
+            self._wait_template('brodmann')
+            if self._volume is None:  # Not created while waiting
+                volume = VolumeObj('brodmann')
+                volume.visible_obj = False
+                self._volume = volume
+                self._attach_volume()
+                logger.info("Volume object loaded on demand")
+        return self._volume
+
+    @property
+    def cross_sec(self):
+        """Cross-sections object, created the first time it is used."""
+        if self._cross_sec is None:
+            self._wait_template('brodmann')
+            if self._cross_sec is None:  # Not created while waiting
+                self._cross_sec = CrossSecObj('brodmann')
+                self._attach_cross_sec()
+                self._fcn_crossec_loaded()
+                logger.info("Cross-sections object loaded on demand")
+        return self._cross_sec
+
+    def _is_loaded(self, name):
+        """Get if a deferred object ('volume' or 'cross_sec') is created."""
+        return getattr(self, '_' + name) is not None
+
+    def _read_template(self, name):
+        """Start reading the file of a template on the background thread."""
+        if name not in self._template_reads:
+            self._template_reads[name] = self._templates.submit(
+                read_template, name)
+        return self._template_reads[name]
+
+    def _wait_template(self, name):
+        """Wait for the file of a template, keeping the GUI responsive."""
+        future = self._read_template(name)
+        while not future.done():
+            QtWidgets.QApplication.processEvents(QtCore.QEventLoop.AllEvents,
+                                                 50)
+            wait([future], timeout=.05)
+
+    def _attach_volume(self):
+        if self._volume.name not in self._volume.list():
+            self._volume.save(tmpfile=True)
+        self._volume.parent = self._vbNode
+
+    def _attach_cross_sec(self):
+        if self._cross_sec.name not in self._cross_sec.list():
+            self._cross_sec.save(tmpfile=True)
+        self._cross_sec.visible_obj = False
+        self._cross_sec.text_size = 2.
+        self._cross_sec.parent = self._csView.wc.scene
+        self._csView.camera = self._cross_sec._get_camera()
+        self._cross_sec.set_shortcuts_to_canvas(self._csView)
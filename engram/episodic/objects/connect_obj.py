@@ -12,6 +12,7 @@ from visbrain.utils import (array2colormap, color2vb, wrap_properties,
                      vector_to_opacity,vispy_array)
 
 from .source_obj import SourceObj
+from ..edges import SparseEdges
 
 
 logger = logging.getLogger('visbrain')
@@ -26,8 +27,10 @@ class ConnectObj(VisbrainObject):
         The name of the connectivity object.
     nodes : array_like
         Array of nodes coordinates of shape (n_nodes, 3).
-    edges : array_like | None
-        Array of ponderations for edges of shape (n_nodes, n_nodes).
+    edges : array_like | SparseEdges | None
+        Array of ponderations for edges of shape (n_nodes, n_nodes). Use an
+        array of shape (n_nodes, n_nodes, n_times) or a
+        :class:`engram.episodic.edges.SparseEdges` for time-resolved edges.
     select : array_like | None
         Array to select edges to display. This should be an array of boolean
         values of shape (n_nodes, n_nodes).
@@ -75,6 +78,11 @@ class ConnectObj(VisbrainObject):
         Higher threshold of the colormap if custom_colors is None.
     over : string | None
         Color to use for values over vmax if custom_colors is None.
+    incremental : bool | False
+        For time-resolved edges given as a
+        :class:`engram.episodic.edges.SparseEdges`, upload the geometry of
+        every edge that is ever active once and only update per-vertex colors
+        at each timepoint. Only supported with color_by='strength'.
     transform : VisPy.visuals.transforms | None
         VisPy transformation to set to the parent node.
     parent : VisPy.parent | None
@@ -119,7 +127,8 @@ class ConnectObj(VisbrainObject):
                  antialias=False, dynamic=None, dynamic_order=1,
                  dynamic_orientation='ascending', cmap='viridis', clim=None,
                  vmin=None, vmax=None, under='gray', over='red',
-                 transform=None, parent=None, verbose=None, _z=-10., **kw):
+                 incremental=False, transform=None, parent=None, verbose=None,
+                 _z=-10., **kw):
         """Init."""
         VisbrainObject.__init__(self, name, parent, transform, verbose, **kw)
         self._update_cbar_args(cmap, clim, vmin, vmax, under, over)
@@ -134,7 +143,7 @@ class ConnectObj(VisbrainObject):
         self._pos = pos.astype(np.float32)
         logger.info("    %i nodes detected" % self._pos.shape[0])
         # Edges :
-        if np.ndim(edges) == 3:
+        if isinstance(edges, SparseEdges) or np.ndim(edges) == 3:
             self.time_edges = edges
             edges = edges[:,:,0]
         assert edges.shape == (len(self), len(self))
@@ -166,6 +175,13 @@ class ConnectObj(VisbrainObject):
         # Alpha :
         assert 0. <= alpha <= 1.
         self._alpha = alpha
+        # Incremental :
+        self._timepoint = 0
+        self._incremental = incremental and isinstance(
+            getattr(self, 'time_edges', None), SparseEdges)
+        if self._incremental:
+            assert color_by == 'strength'
+            self._index_time_edges()
 
         # _______________________ LINE _______________________
         self._connect = visuals.Line(name='ConnectObjLine', width=line_width,
@@ -215,7 +231,11 @@ class ConnectObj(VisbrainObject):
         return keep_easing  
 
     def _update_time(self,timepoint=None):
-        if timepoint:                     
+        if timepoint is not None and self._incremental:
+            self._set_time_colors(int(timepoint))
+            self._connect.set_data(color=self._line_color)
+            self.update()
+        elif timepoint is not None:
             edges = self.time_edges[:,:,int(timepoint)] # fs/time
             if not np.ma.isMA(edges):
                 mask = np.zeros(edges.shape, dtype=bool)
@@ -224,8 +244,54 @@ class ConnectObj(VisbrainObject):
             self._build_line()
             self.update()
 
+    def _update_live(self, values):
+        """Connect the sources active in the latest values of a live stream."""
+        self._incremental = False
+        rows, cols, weights = SparseEdges.from_activity(
+            np.asarray(values)[:, np.newaxis]).at(0)
+        edges = np.ma.masked_all((len(self), len(self)), dtype=np.float32)
+        edges[rows, cols] = weights
+        self._edges = edges
+        self._build_line()
+        self.update()
+
+    def _index_time_edges(self):
+        """Give every edge that is ever active a fixed slot in the line."""
+        edges, n_nodes = self.time_edges, len(self)
+        pairs, self._slots = np.unique(
+            edges.rows.astype(np.int64) * n_nodes + edges.cols,
+            return_inverse=True)
+        self._pairs = np.c_[pairs // n_nodes, pairs % n_nodes]
+        self._line_color = np.zeros((2 * len(pairs), 4), dtype=np.float32)
+        self._active = np.array([], dtype=int)
+        self._set_time_colors(self._timepoint)
+
+    def _set_time_colors(self, timepoint):
+        """Only recolor the edges that change between two timepoints."""
+        edges = self.time_edges
+        lower, upper = edges.indptr[timepoint], edges.indptr[timepoint + 1]
+        # Hide the edges of the previous timepoint :
+        self._line_color[2 * self._active, 3] = 0.
+        self._line_color[2 * self._active + 1, 3] = 0.
+        # Color the active ones :
+        slots = self._slots[lower:upper]
+        if len(slots):
+            color = self._get_color(edges.values[lower:upper])
+            self._line_color[2 * slots, :] = color
+            self._line_color[2 * slots + 1, :] = color
+        self._active = slots
+        self._timepoint = timepoint
+
     def _build_line(self):
         """Build the connectivity line."""
+        # Incremental : geometry of every edge, colors of the current time
+        if self._incremental:
+            self._connect.visible = len(self._pairs) > 0
+            if self._connect.visible:
+                self._connect.set_data(pos=self._pos[self._pairs.ravel()],
+                                       color=self._line_color)
+            return
+
         pos, edges = self._pos, self._edges
         # Color either edges or nodes :
         # logger.info("    %s coloring method for connectivity" % self._color_by)
@@ -257,7 +323,21 @@ class ConnectObj(VisbrainObject):
             # Build values :
             values = np.full((line_pos.shape[0],), edges.min(), dtype=float)
             values[1::2] = edges.compressed()
+
+        # Nothing active (e.g. silent timepoint) : hide the line
+        if not len(values):
+            self._connect.visible = False
+            return
+        self._connect.visible = True
+
         #logger.info("    %i connectivity links displayed" % line_pos.shape[0])
+        color = self._get_color(values)
+
+        # Send data to the connectivity object :
+        self._connect.set_data(pos=line_pos, color=color)
+
+    def _get_color(self, values):
+        """Get the color of each value."""
         self._minmax = (values.min(), values.max())
         if self._clim is None:
             self._clim = self._minmax
@@ -281,8 +361,7 @@ class ConnectObj(VisbrainObject):
                                             order=self._dyn_order,
                                             orientation=self._dyn_orient)
 
-        # Send data to the connectivity object :
-        self._connect.set_data(pos=line_pos, color=color)
+        return color
 
     def get_nb_connections_per_node(self, sort='index', order='ascending'):
         """Get the number of connections per node.
@@ -450,6 +529,7 @@ class ConnectObj(VisbrainObject):
     def color_by(self, value):
         """Set color_by value."""
         assert value in ['strength', 'count', 'causal']
+        assert not self._incremental or value == 'strength'
         self._color_by = value
         self._build_line()
 
@@ -465,6 +545,8 @@ class ConnectObj(VisbrainObject):
         """Set dynamic value."""
         assert value is None or len(value) == 2
         self._dynamic = value
+        if self._incremental:
+            self._set_time_colors(self._timepoint)
         self._build_line()
 
     # ----------- ALPHA -----------
@@ -478,8 +560,12 @@ class ConnectObj(VisbrainObject):
     def alpha(self, value):
         """Set alpha value."""
         assert 0. <= value <= 1.
-        self._connect.color[:, -1] = value
         self._alpha = value
+        if self._incremental:
+            self._set_time_colors(self._timepoint)
+            self._connect.set_data(color=self._line_color)
+        else:
+            self._connect.color[:, -1] = value
         self.update()
 
 
@@ -73,6 +73,10 @@ class SourceObj(VisbrainObject):
         Specify which source's have to be displayed. If visible is True, all
         sources are displayed, False all sources are hiden. Alternatively, use
         an array of shape (n_sources,) to select which sources to display.
+    radius_window : int | None
+        For (n_sources, n_times) data, number of timepoints whose radius is
+        computed at once, against the global min / max of the data. None
+        precomputes the radius of every timepoint.
     transform : VisPy.visuals.transforms | None
         VisPy transformation to set to the parent node.
     parent : VisPy.parent | None
@@ -118,8 +122,8 @@ class SourceObj(VisbrainObject):
                  edge_color='black', system='mni', mask=None,
                  mask_color='gray', mask_radius=5., text=None, text_size=2.,
                  text_color='white', text_bold=False,
-                 text_translate=(0., 2., 0.), visible=True, transform=None,
-                 parent=None, verbose=None, _z=-10., **kw):
+                 text_translate=(0., 2., 0.), visible=True, radius_window=None,
+                 transform=None, parent=None, verbose=None, _z=-10., **kw):
         """Init."""
         VisbrainObject.__init__(self, name, parent, transform, verbose, **kw)
         # _______________________ CHECKING _______________________
@@ -135,6 +139,9 @@ class SourceObj(VisbrainObject):
         radius_max = max(radius_min, radius_max)
         self._radius_min, self._radius_max = radius_min, radius_max
         self._mask_radius = mask_radius
+        assert radius_window is None or radius_window > 0
+        self._radius_window = radius_window
+        self._radius_start = None
         # Data :
         if data is None:
             data = np.ones((len(self),))
@@ -234,12 +241,15 @@ class SourceObj(VisbrainObject):
     def _shift_radius(self,inc=1):
         self._radius_min += inc
         self._radius_max += inc
+        self._radius_start = None
 
     
     def _update_radius(self,timepoint=None):
         """Update marker's radius."""
         logger.debug("Weird edge arround markers (source_obj.py)")
-        if not hasattr(self,'radius'):
+        windowed = (self._radius_window is not None and self._data.ndim == 2
+                    and not hasattr(self, 'radius'))
+        if not hasattr(self,'radius') and not windowed:
             if np.unique(self._data).size == 1:
                 self.radius = self._radius_min * np.ones((len(self,)))
             else:
@@ -247,7 +257,10 @@ class SourceObj(VisbrainObject):
                                 tomax=self._radius_max)
 
         if timepoint:                     
-            self._sources._data['a_size'] = self.radius[:,int(timepoint)] # fs/time
+            if windowed:
+                self._sources._data['a_size'] = self._radius_at(int(timepoint))
+            else:
+                self._sources._data['a_size'] = self.radius[:,int(timepoint)] # fs/time
             if not hasattr(self,'_timer'):
                 self._timer = visuals.Text(str(int(timepoint)), pos=[0,100,0],
                                 bold=True, name='Text',
@@ -258,7 +271,9 @@ class SourceObj(VisbrainObject):
             self._timer.update()
 
         else:
-            if len(self.radius.shape) == 2:
+            if windowed:
+                self._sources._data['a_size'] = self._scale_radius(np.mean(self._data,axis=1))
+            elif len(self.radius.shape) == 2:
                 self._sources._data['a_size'] = np.mean(self.radius,axis=1)    
             else:
                 self._sources._data['a_size'] = self.radius
@@ -274,6 +289,39 @@ class SourceObj(VisbrainObject):
         self._sources_text.text = text
         self.update()
     
+    def _scale_radius(self, data):
+        """Map data to radii using the min / max of the whole data."""
+        if not hasattr(self, '_data_range'):
+            self._data_range = (np.float32(self._data.min()), np.float32(self._data.max()))
+        xm, xh = self._data_range
+        if xm == xh:
+            return np.full(np.shape(data), self._radius_min, dtype=np.float32)
+        coef = (self._radius_max - self._radius_min) / (xh - xm)
+        return (np.float32(data) - xh) * coef + self._radius_max
+
+    def _radius_at(self, timepoint):
+        """Get the radius of one timepoint, computing radius_window
+        timepoints at a time around it."""
+        start, window = self._radius_start, self._radius_window
+        if start is None or not start <= timepoint < start + self._radius_chunk.shape[1]:
+            # Compute ahead of the timepoint, or behind it when playing backward
+            if start is not None and timepoint < start:
+                start = max(timepoint - window + 1, 0)
+            else:
+                start = timepoint
+            self._radius_chunk = self._scale_radius(self._data[:, start:start + window])
+            self._radius_start = start
+        return self._radius_chunk[:, timepoint - start]
+
+    def _update_live(self, values, vmax=None):
+        """Update marker's radius from the latest values of a live stream."""
+        values = np.asarray(values, dtype=np.float32)
+        if vmax is None:
+            vmax = np.abs(values).max()
+        scale = np.clip(values / vmax, 0., 1.) if vmax > 0 else np.zeros_like(values)
+        self.radius = self._radius_min + scale * (self._radius_max - self._radius_min)
+        self._update_radius()
+
     def _update_target_position(self,xyz=None):
 
         # Check XYZ :
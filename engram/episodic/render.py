@@ -0,0 +1,124 @@
+'''
+This module renders the separation environment offline.
+
+Frames are drawn on an off-screen vispy canvas while displayed_time is
+stepped by a fixed amount per frame, so the same ID always gives the same
+movie. Rendering and writing are pipelined: frames are handed to a writer
+thread through a bounded queue so encoding overlaps with drawing.
+
+Pass backend='egl' (or 'osmesa') to render on machines without a display.
+'''
+
+import os
+import queue
+import threading
+import numpy as np
+
+
+def render(id, path, fps=30., duration=None, start=0., timescaling=1/4, rotation=.25,
+           size=(1920, 1080), bgcolor='black', azimuth=180-45., elevation=0., roi=False,
+           backend=None, queue_size=16):
+    '''
+    Render the separation environment of an ID to a movie or image sequence.
+
+    A path ending in a video extension (.mp4, .gif, ...) is encoded with
+    imageio. Otherwise path is a directory of numbered .png frames.
+
+    timescaling (seconds of data per second of movie) and rotation (degrees
+    of azimuth per frame) match the interactive Engram defaults.
+    '''
+    import vispy
+    if backend is not None:
+        vispy.use(app=backend)
+    from vispy import scene
+    from .envs import separation_objects
+
+    objects = separation_objects(id)
+    fs = objects['metadata']['fs']
+    s_obj, c_obj = objects['source_obj'], objects['connect_obj']
+    length = np.shape(s_obj.data)[1] / fs
+    if duration is None:
+        duration = length / timescaling
+    n_frames = int(round(duration * fps))
+
+    canvas = scene.SceneCanvas(show=False, size=size, bgcolor=bgcolor)
+    view = canvas.central_widget.add_view()
+    visible = [s_obj, c_obj] + ([objects['roi_obj']] if roi else [])
+    for obj in visible:
+        obj.parent = view.scene
+    view.camera = s_obj._get_camera()
+    view.camera.azimuth, view.camera.elevation = azimuth, elevation
+
+    writer = FrameWriter(path, fps=fps, queue_size=queue_size)
+    writer.start()
+    try:
+        for frame in range(n_frames):
+            displayed_time = (start + frame * timescaling / fps) % length
+            timepoint = int(displayed_time * fs)
+            s_obj._update_radius(timepoint=timepoint)
+            c_obj._update_time(timepoint=timepoint)
+            view.camera.azimuth += rotation
+            writer.put(canvas.render())
+    finally:
+        writer.close()
+        canvas.close()
+
+    return n_frames
+
+
+class FrameWriter(threading.Thread):
+
+    '''
+    Write rendered frames from a bounded queue on a background thread.
+    '''
+
+    VIDEO = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.gif')
+
+    def __init__(self, path, fps=30., queue_size=16):
+        threading.Thread.__init__(self, name='FrameWriter', daemon=True)
+        self.path = path
+        self.fps = fps
+        self.video = os.path.splitext(path)[1].lower() in self.VIDEO
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._done = False
+        self.n_frames = 0
+
+    def put(self, img):
+        # Blocks while the queue is full, so memory stays bounded
+        if self._error is not None:
+            raise self._error
+        self._queue.put(img)
+
+    def close(self):
+        self._queue.put(None)
+        self.join()
+        if self._error is not None:
+            raise self._error
+
+    def run(self):
+        try:
+            if self.video:
+                import imageio
+                with imageio.get_writer(self.path, fps=self.fps) as video:
+                    self._drain(video.append_data)
+            else:
+                from vispy.io import write_png
+                os.makedirs(self.path, exist_ok=True)
+                self._drain(lambda img: write_png(
+                    os.path.join(self.path, 'frame_{:06d}.png'.format(self.n_frames)), img))
+        except Exception as e:
+            self._error = e
+            # Keep consuming so the renderer is never blocked on a dead writer,
+            # unless the end of the frames was already reached (failed finalize)
+            while not self._done and self._queue.get() is not None:
+                pass
+
+    def _drain(self, write):
+        while True:
+            img = self._queue.get()
+            if img is None:
+                self._done = True
+                break
+            write(img)
+            self.n_frames += 1
@@ -4,4 +4,4 @@
 and encoding them into models
 '''
 
-from . import (events,filters,missingdata)
\ No newline at end of file
+from . import (cache,events,filters,missingdata)
\ No newline at end of file
@@ -0,0 +1,86 @@
+'''
+Persistent cache of what is parsed out of recording files.
+
+Entries are .npz files named after the path, size and modification time of
+the source file (and a tag naming what was derived from it), so an entry is
+only reused while the file is unchanged. Set the ENGRAM_CACHE environment
+variable to move the cache, or call :func:`clear` to empty it.
+'''
+
+import hashlib
+import os
+import numpy as np
+
+CACHE_DIR = os.environ.get('ENGRAM_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'engram'))
+VERSION = 1  # Bump when the layout of an entry changes
+
+
+def key(path, tag):
+    '''
+    Name of the entry of path and tag, or None if the file does not exist.
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    source = '\0'.join(str(part) for part in [VERSION, os.path.abspath(path), stat.st_size, stat.st_mtime_ns, tag])
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def load(path, tag, compute, cache_dir=None):
+    '''
+    Get the arrays derived from a file. On a miss, compute() gives a dict of
+    name -> array that is stored for the next call.
+    '''
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    name = key(path, tag)
+    if name is None:
+        return compute()
+    filename = os.path.join(cache_dir, name + '.npz')
+
+    if os.path.isfile(filename):
+        try:
+            with np.load(filename, allow_pickle=False) as entry:
+                return {field: entry[field] for field in entry.files}
+        except (OSError, ValueError):
+            pass  # Corrupted entry : compute it again
+
+    arrays = compute()
+    os.makedirs(cache_dir, exist_ok=True)
+    # Parallel writers each write their own file before moving it in place
+    tmp = '{}.{}.tmp.npz'.format(filename[:-4], os.getpid())
+    np.savez(tmp, **arrays)
+    os.replace(tmp, filename)
+    return arrays
+
+
+def clear(cache_dir=None):
+    '''
+    Remove every cache entry.
+    '''
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if os.path.isdir(cache_dir):
+        for filename in os.listdir(cache_dir):
+            if filename.endswith('.npz'):
+                os.remove(os.path.join(cache_dir, filename))
+
+
+def pack(prefix, series):
+    '''
+    Flatten a dict of 1D arrays into names, offsets and concatenated values.
+    '''
+    names = [str(name) for name in series]
+    lengths = [len(values) for values in series.values()]
+    values = np.concatenate([np.asarray(values, dtype=np.float64) for values in series.values()]) \
+        if series else np.array([], dtype=np.float64)
+    return {prefix + '_names': np.array(names, dtype=str),
+            prefix + '_offsets': np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+            prefix + '_values': values}
+
+
+def unpack(prefix, arrays):
+    '''
+    Rebuild the dict flattened by :func:`pack` (names become strings).
+    '''
+    names, offsets, values = [arrays[prefix + suffix] for suffix in ['_names', '_offsets', '_values']]
+    return {name: values[start:stop] for name, start, stop in zip(names.tolist(), offsets[:-1], offsets[1:])}
@@ -1,65 +1,129 @@
 
+import hashlib
+import re
+import numpy as np
+
+from engram.procedural import cache as _cache
+
+DECODERS = {}
+
+
+class EventTable(object):
+
+    '''
+    Decoder of the event channels of a project.
+
+    Channels whose name contains neuron_marker hold spike times. The others
+    are named after the first matching DIO code of codes (later codes take
+    precedence when a name holds several) and keep their channel name when
+    no code matches.
+    '''
+
+    def __init__(self, name, codes, neuron_marker='nr'):
+        self.name = name
+        self.codes = dict(codes)
+        self.neuron_marker = neuron_marker
+        self._rank = {code: rank for rank, code in enumerate(self.codes)}
+        # Longest codes first, so a code is never shadowed by one of its prefixes
+        self._pattern = re.compile('|'.join(re.escape(code) for code in sorted(self.codes, key=len, reverse=True)))
+        self.digest = hashlib.sha1(repr((sorted(self.codes.items()), neuron_marker)).encode()).hexdigest()[:12]
+        # Decoded name of every channel name seen so far, starting with the codes
+        self._table = {code: self._decode(code) for code in self.codes}
+
+    def __repr__(self):
+        return "EventTable('{}',{})".format(self.name, len(self.codes))
+
+    def __str__(self):
+        return '{} _ {}'.format(self.name, len(self.codes))
+
+    def names(self, channels):
+        '''
+        Event name of every channel (None for neurons). Each distinct channel
+        name is decoded once, then looked up in the table of the decoder.
+        '''
+        channels = np.asarray(channels, dtype=str)
+        if not channels.size:
+            return []
+        unique, inverse = np.unique(channels, return_inverse=True)
+        for channel in unique.tolist():
+            if channel not in self._table:
+                self._table[channel] = self._decode(channel)
+        decoded = np.array([self._table[channel] for channel in unique.tolist()], dtype=object)
+        return decoded[np.ravel(inverse)].tolist()
+
+    def _decode(self, channel):
+        if self.neuron_marker in channel:
+            return None
+        found = self._pattern.findall(channel)
+        return self.codes[max(found, key=self._rank.get)] if found else channel
+
+    def __call__(self, reader):
+        reader.parse_header()
+        channels = [str(channel[0]) for channel in reader.header['event_channels']]
+
+        # Timestamps of every channel are rescaled at once, then split back
+        stamps = [reader.get_event_timestamps(block_index=0, seg_index=0, event_channel_index=chan_index,
+                                              t_start=None, t_stop=None)[0]
+                  for chan_index in range(len(channels))]
+        offsets = np.cumsum([len(times) for times in stamps])[:-1]
+        stamps = np.concatenate(stamps) if stamps else np.array([], dtype=np.int64)
+        times = np.split(reader.rescale_event_timestamp(stamps, dtype='float64'), offsets)
+
+        events = {}
+        neurons = {}
+        for channel, event_name, channel_times in zip(channels, self.names(channels), times):
+            if event_name is None:
+                neurons[channel] = channel_times
+            else:
+                events[event_name] = channel_times
+
+        print('Done parsing {} events'.format(self.name))
+
+        return events, neurons
+
+
+def register(decoder):
+    '''
+    Make a decoder available to :func:`select` and :func:`load` under its name.
+    '''
+    DECODERS[decoder.name] = decoder
+    return decoder
+
+
 def select(name,reader):
-    selection = {
-        "RAM": RAM,
-    }
-    # Get the function from switcher dictionary
-    func = selection.get(name, lambda: "Invalid event parser")
-    # Execute the function
-    return func(reader)
-
-
-
-def RAM(reader):
-    reader.parse_header()
-    nb_event_channel = reader.event_channels_count()
-
-    events = {}
-    neurons ={}
-
-    for chan_index in range(nb_event_channel):
-        nb_channel = reader.header['event_channels'][chan_index][0];
-        event_name = None
-        if 'nr' not in nb_channel:
-            a = ['DIO_00002','DIO_65533']
-            if any(x in nb_channel for x in a):
-                event_name = 'ITI_ON'
-            if any(x in nb_channel for x in ['DIO_00004','DIO_65531']):
-                event_name = 'FOCUS_ON'
-            if any(x in nb_channel for x in ['DIO_00008','DIO_65527']):
-                event_name = 'SAMPLE_ON'
-            if any(x in nb_channel for x in ['DIO_00016','DIO_65519']):
-                event_name = 'SAMPLE_RESPONSE'
-            if any(x in nb_channel for x in ['DIO_00032','DIO_65503']):
-                event_name = 'MATCH_ON'
-            if any(x in nb_channel for x in ['DIO_00064','DIO_65471']):
-                event_name = 'MATCH_RESPONSE'
-            if any(x in nb_channel for x in ['DIO_00128','DIO_65407']):
-                event_name = 'CORRECT_RESPONSE'
-            if any(x in nb_channel for x in ['DIO_00256','DIO_65279']):
-                event_name = 'END_SESSION'
-            if any(x in nb_channel for x in ['DIO_Changed','DIO_65533']):
-                event_name = 'DIO_CHANGED'
-
-            times = reader.get_event_timestamps(block_index=0, seg_index=0,
-                                                event_channel_index=chan_index,
-                                                t_start=None,
-                                                t_stop=None)
-            times = reader.rescale_event_timestamp(times[0], dtype='float64')
-            events[event_name] = times
-
-        else:
-            neuron_name = nb_channel
-            times = reader.get_event_timestamps(block_index=0, seg_index=0,
-                                                event_channel_index=chan_index,
-                                                t_start=None,
-                                                t_stop=None)
-            times = reader.rescale_event_timestamp(times[0], dtype='float64')
-            neurons[neuron_name] = times 
-
-    print('Done parsing RAM events')
-
-    return events,neurons
+    if name not in DECODERS:
+        raise ValueError("Unknown event parser {}, use one of {}".format(name, ', '.join(DECODERS)))
+    return DECODERS[name](reader)
+
+
+def load(name, filename, cache=True):
+    '''
+    Decode the events and neurons of a file with the parser of a project.
+
+    Decoded timestamps are cached (see :mod:`engram.procedural.cache`), so
+    reopening an unchanged file skips parsing it. Event names are strings.
+    '''
+    def decode():
+        import neo
+        events, neurons = select(name, neo.get_io(filename=filename))
+        return dict(_cache.pack('events', events), **_cache.pack('neurons', neurons))
+
+    tag = 'events-{}-{}'.format(name, DECODERS[name].digest if name in DECODERS else '')
+    arrays = _cache.load(filename, tag, decode) if cache else decode()
+    return _cache.unpack('events', arrays), _cache.unpack('neurons', arrays)
+
+
+RAM = register(EventTable('RAM', {
+    'DIO_00002': 'ITI_ON',
+    'DIO_00004': 'FOCUS_ON', 'DIO_65531': 'FOCUS_ON',
+    'DIO_00008': 'SAMPLE_ON', 'DIO_65527': 'SAMPLE_ON',
+    'DIO_00016': 'SAMPLE_RESPONSE', 'DIO_65519': 'SAMPLE_RESPONSE',
+    'DIO_00032': 'MATCH_ON', 'DIO_65503': 'MATCH_ON',
+    'DIO_00064': 'MATCH_RESPONSE', 'DIO_65471': 'MATCH_RESPONSE',
+    'DIO_00128': 'CORRECT_RESPONSE', 'DIO_65407': 'CORRECT_RESPONSE',
+    'DIO_00256': 'END_SESSION', 'DIO_65279': 'END_SESSION',
+    'DIO_Changed': 'DIO_CHANGED', 'DIO_65533': 'DIO_CHANGED', # Not ITI_ON
+}))
 
 
 def Neurogenesis():
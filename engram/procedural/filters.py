@@ -1,14 +1,74 @@
+from functools import lru_cache
 
-from scipy.signal import butter, filtfilt
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfiltfilt
 
-def select(filter,data,min=0,max=None,fs=2000,order=5):
+def select(filter,data,min=0,max=None,fs=2000,order=5,axis=-1,chunk=None,overlap=None):
     selection = {
         "bandpass": butter_bandpass_filter
     }
     # Get the function from switcher dictionary
     func = selection.get(filter, lambda: "Invalid event parser")
     # Execute the function
-    return func(data,min,max,fs,order)
+    return func(data,min,max,fs,order,axis=axis,chunk=chunk,overlap=overlap)
+
+@lru_cache(maxsize=None)
+def butter_sos(btype, cutoff, fs, order=5):
+    """Design a Butterworth filter as second-order sections.
+
+    Designs are cached by (btype, cutoff, fs, order), so filtering many
+    channels or chunks only designs the filter once.
+    """
+    nyq = 0.5 * fs
+    normal_cutoff = np.asarray(cutoff) / nyq
+    return butter(order, normal_cutoff, btype=btype, analog=False, output='sos')
+
+def settling_samples(sos, tol=1e-9, block=4096, limit=2**24):
+    """Number of samples for the impulse response of sos to decay below tol
+    times its peak (at most limit).
+
+    This is how far the transient of a cut in the signal reaches, so the
+    overlap that chunked filtering needs to match filtering in one go.
+    """
+    zi = np.zeros((np.shape(sos)[0], 2))
+    impulse = np.zeros(block)
+    impulse[0] = 1.
+    h, zi = sosfilt(sos, impulse, zi=zi)
+    threshold = tol * np.max(np.abs(h))
+
+    n = 0
+    start = 0
+    above = np.flatnonzero(np.abs(h) > threshold)
+    while len(above) and start < limit:
+        n = start + above[-1] + 1
+        start += block
+        h, zi = sosfilt(sos, np.zeros(block), zi=zi)
+        above = np.flatnonzero(np.abs(h) > threshold)
+    return n
+
+def sos_filter(sos, data, axis=-1, chunk=None, overlap=None):
+    """Zero-phase filter every channel of data at once along axis.
+
+    With chunk, the last axis is filtered chunk samples at a time, each chunk
+    padded by overlap samples on both sides to hide the edge transients, so
+    only one padded chunk of a lazily-loaded signal is read at a time.
+    overlap defaults to :func:`settling_samples` of sos; a shorter overlap
+    makes the result depend on the chunking.
+    """
+    if chunk is None:
+        return sosfiltfilt(sos, np.asarray(data), axis=axis)
+
+    assert axis in (-1, np.ndim(data) - 1), "Chunked filtering runs along the last axis"
+    n = np.shape(data)[-1]
+    if overlap is None:
+        overlap = settling_samples(sos)
+    y = np.empty(np.shape(data), dtype=np.float64)
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        lower, upper = max(start - overlap, 0), min(stop + overlap, n)
+        filtered = sosfiltfilt(sos, np.asarray(data[..., lower:upper]), axis=-1)
+        y[..., start:stop] = filtered[..., start - lower:stop - lower]
+    return y
 
 def butter_lowpass(cutoff, fs, order=5):
     nyq = 0.5 * fs
@@ -16,9 +76,9 @@ def butter_lowpass(cutoff, fs, order=5):
     b, a = butter(order, normal_cutoff, btype='low', analog=False)
     return b, a
 
-def butter_lowpass_filter(data, cutoff, fs, order=5):
-    b, a = butter_lowpass(cutoff, fs, order=order)
-    y = filtfilt(b, a, data)
+def butter_lowpass_filter(data, cutoff, fs, order=5, axis=-1, chunk=None, overlap=None):
+    sos = butter_sos('low', cutoff, fs, order=order)
+    y = sos_filter(sos, data, axis=axis, chunk=chunk, overlap=overlap)
     return y
 
 def butter_bandpass(lowcut, highcut, fs, order=5):
@@ -29,7 +89,7 @@ def butter_bandpass(lowcut, highcut, fs, order=5):
     return b, a
 
 
-def butter_bandpass_filter(data, lowcut, highcut, fs, order=5):
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    y = filtfilt(b, a, data)
-    return y
\ No newline at end of file
+def butter_bandpass_filter(data, lowcut, highcut, fs, order=5, axis=-1, chunk=None, overlap=None):
+    sos = butter_sos('band', (lowcut, highcut), fs, order=order)
+    y = sos_filter(sos, data, axis=axis, chunk=chunk, overlap=overlap)
+    return y
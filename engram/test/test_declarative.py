@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""Tests for engram.declarative."""
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+from scipy import signal
+
+from engram.declarative import ID, Bin, Cont, Duration, RawSignal, TimeAxis, ChannelIndex, SpikeRing, ContRing
+from engram.declarative import raw, store
+from engram.declarative.bin import trail_kernel
+
+FS = 100.
+
+
+def _duration(n_times=1000):
+    md = {'fs': FS}
+    rng = np.random.RandomState(0)
+    spikes = (rng.rand(3, n_times) < .05).astype(int)
+    signals = np.arange(2 * n_times, dtype=float).reshape(2, n_times) + 2
+    return Duration('test', bins=spikes, conts=signals, metadata=md), spikes, signals
+
+
+def test_epochs_inside_recording():
+    duration, spikes, signals = _duration()
+    epochs, relative_time = duration.epochs(duration.conts[0], np.array([5., 2.5]), (-.5, .5))
+    assert epochs.shape == (2, 2, 100)
+    np.testing.assert_array_equal(epochs[0], signals[:, 450:550])
+    np.testing.assert_array_equal(epochs[1], signals[:, 200:300])
+    np.testing.assert_allclose(np.asarray(relative_time), -.5 + np.arange(100) / FS)
+
+    epochs, _ = duration.epochs(duration.bins[0], np.array([5.]), (-.5, .5))
+    np.testing.assert_array_equal(epochs[0], spikes[:, 450:550])
+
+
+def test_epochs_at_recording_edges_are_shifted_inside():
+    duration, spikes, signals = _duration()
+    times = np.array([0., .1, 9.9, 10.])
+    epochs, _ = duration.epochs(duration.conts[0], times, (-.5, .5))
+    for epoch, start in zip(epochs, [0, 0, 900, 900]):
+        np.testing.assert_array_equal(epoch, signals[:, start:start + 100])
+
+    epochs, _ = duration.epochs(duration.bins[0], times, (-.5, .5))
+    for epoch, start in zip(epochs, [0, 0, 900, 900]):
+        np.testing.assert_array_equal(epoch, spikes[:, start:start + 100])
+
+
+def test_epochs_as_long_as_recording():
+    duration, _, signals = _duration()
+    epochs, _ = duration.epochs(duration.conts[0], np.array([3.]), (-5., 5.))
+    np.testing.assert_array_equal(epochs[0], signals)
+
+
+def test_epochs_longer_than_recording_raise():
+    duration, _, _ = _duration()
+    with pytest.raises(ValueError):
+        duration.epochs(duration.conts[0], np.array([5.]), (-6., 6.))
+    with pytest.raises(ValueError):
+        duration.epochs(duration.bins[0], np.array([5.]), (-6., 6.))
+
+
+def _stft_cont(n_times):
+    md = {'fs': FS, 'bandpass_min': 1, 'bandpass_max': 40, 't_bin': 1.,
+          '2D_min': 0, '2D_max': 40, 'norm': False}
+    signals = np.random.RandomState(0).randn(2, n_times) + 2
+    return Cont('test', data=signals, metadata=md)
+
+
+def test_stft_matches_spectrogram():
+    cont = _stft_cont(2000)
+    lfp = np.copy(_stft_cont(2000).lfp().data)
+    f, t, Zxx = signal.spectrogram(lfp, FS, 'hann', nperseg=100, noverlap=12, axis=-1)
+    keep = f <= 40
+
+    cont.stft(chunk=250)  # Several chunks
+    assert isinstance(cont.nD_labels['2D'], TimeAxis)
+    np.testing.assert_allclose(np.asarray(cont.nD_labels['2D']), t)
+    np.testing.assert_allclose(cont.nD_labels['3D'], f[keep])
+    np.testing.assert_allclose(cont.data, np.swapaxes(Zxx[:, keep] ** 2, -1, -2), rtol=1e-5, atol=1e-12)
+
+
+def test_stft_shorter_than_window_raises():
+    with pytest.raises(ValueError):
+        _stft_cont(80).stft()
+
+
+def _convolved_trail(spikes, TRAIL):
+    offsets, kernel = trail_kernel(TRAIL)
+    expected = np.zeros(spikes.shape)
+    for channel, time in zip(*np.nonzero(spikes)):
+        for offset, weight in zip(offsets, kernel):
+            if 0 <= time + offset < spikes.shape[1]:
+                expected[channel, time + offset] += weight
+    return expected
+
+
+def test_trail_matches_convolution():
+    TRAIL = 10
+    spikes = (np.random.RandomState(1).rand(4, 300) < .05).astype(int)
+    spikes[0, 0] = spikes[1, -1] = 1  # Kernels clipped at both ends
+    binary = Bin('test', data=spikes, metadata={'fs': FS})
+    trail = binary.trail(TRAIL=TRAIL)
+
+    assert trail.dtype == np.float32
+    np.testing.assert_allclose(trail, _convolved_trail(spikes, TRAIL), rtol=1e-6)
+    assert binary.trail(TRAIL=TRAIL) is trail  # Cached
+    np.testing.assert_allclose(binary.trail(TRAIL=TRAIL, timepoints=100),
+                               _convolved_trail(spikes[:, :100], TRAIL), rtol=1e-6)
+
+
+def test_spike_ring_matches_trail():
+    n_times, TRAIL = 300, 10
+    spikes = (np.random.RandomState(1).rand(4, n_times) < .05).astype(int)
+    spikes[0, 0] = spikes[1, -1] = 1
+    trail = Bin('test', data=spikes, metadata={'fs': FS}).trail(TRAIL=TRAIL)
+
+    ring = SpikeRing(4, window=n_times + TRAIL, fs=FS, TRAIL=TRAIL)
+    channels, samples = np.nonzero(spikes)
+    order = np.argsort(samples, kind='stable')
+    for chunk in np.array_split(order, 7):  # Pushed in time order, several at once
+        ring.push(channels[chunk], samples[chunk])
+    ring.push([-1], [n_times])  # Clock tick
+    assert ring.latest() == n_times - 1
+
+    np.testing.assert_allclose(ring.view()[:, :n_times], trail)
+    np.testing.assert_allclose(ring.column(n_times // 2), trail[:, n_times // 2])
+
+
+def test_cont_ring_keeps_the_latest_window():
+    data = np.arange(3 * 50, dtype=np.float32).reshape(3, 50)
+    ring = ContRing(3, window=20, fs=FS)
+    for start in range(0, 50, 7):
+        ring.push(data[:, start:start + 7])
+    assert ring.latest() == 49
+    np.testing.assert_array_equal(ring.view(), data[:, 30:])
+    np.testing.assert_array_equal(ring.column(45), data[:, 45])
+    np.testing.assert_array_equal(ring.column(10), np.zeros(3))  # Left the window
+
+    ring.push_bytes(np.arange(60, dtype='<f4').reshape(20, 3).tobytes())  # Time-major
+    np.testing.assert_array_equal(ring.view(), np.arange(60).reshape(20, 3).T)
+
+
+class _RawIO(object):
+    """neo rawio reader of 4 channels x 50 int16 samples."""
+
+    opened = []
+
+    def __init__(self, filename):
+        _RawIO.opened.append(filename)
+        self.samples = np.arange(50 * 4, dtype=np.int16).reshape(50, 4)  # Time x Channels
+        self.header = {'signal_channels': np.array([('ch', 'uV')] * 4, dtype=[('name', 'U8'), ('units', 'U8')])}
+
+    def parse_header(self):
+        pass
+
+    def signal_channels_count(self):
+        return 4
+
+    def get_signal_sampling_rate(self, channel_indexes):
+        return FS
+
+    def get_signal_size(self, block_index, seg_index, channel_indexes):
+        return 50
+
+    def get_analogsignal_chunk(self, block_index, seg_index, i_start, i_stop, channel_indexes):
+        return self.samples[i_start:i_stop][:, channel_indexes]
+
+    def rescale_signal_raw_to_float(self, chunk, dtype, channel_indexes):
+        return chunk.astype(dtype) * .5
+
+
+def test_raw_signal_reads_windows_lazily(monkeypatch, tmpdir):
+    monkeypatch.setattr(raw, 'get_rawio_class', lambda filename: _RawIO)
+    monkeypatch.setattr(raw.cache, 'CACHE_DIR', str(tmpdir.join('cache')))
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join('session.ns5').write('')
+    del _RawIO.opened[:]
+
+    signal = RawSignal('session.ns5', channel_indexes=[1, 3])
+    assert signal.filename == os.path.join(str(tmpdir), 'session.ns5')
+    assert signal.shape == (2, 50) and signal.fs == FS and signal.units == 'uV'
+    expected = np.arange(200).reshape(50, 4)[:, [1, 3]].T * .5
+    np.testing.assert_array_equal(np.asarray(signal), expected)
+    np.testing.assert_array_equal(signal[:, 10:20:3], expected[:, 10:20:3])
+    np.testing.assert_array_equal(signal[1, 5:8], expected[1, 5:8])
+    np.testing.assert_array_equal(signal[:, 7], expected[:, 7])
+    np.testing.assert_array_equal(signal.raw(0, 10), expected[:, :10] * 2)
+    assert len(_RawIO.opened) == 1
+
+    # Pickles drop the reader, which reopens from the absolute path
+    monkeypatch.chdir(tmpdir.mkdir('elsewhere'))
+    restored = pickle.loads(pickle.dumps(signal))
+    assert restored._reader is None
+    np.testing.assert_array_equal(np.asarray(restored), expected)
+    assert _RawIO.opened[-1] == signal.filename
+
+    # The header is cached, so describing the file again does not open it
+    n_opened = len(_RawIO.opened)
+    assert RawSignal(signal.filename, channel_indexes=[1, 3]).shape == (2, 50)
+    assert len(_RawIO.opened) == n_opened
+
+
+def test_store_round_trip(tmpdir):
+    md = {'name': 'session', 'project': 'RAM', 'fs': FS}
+    spikes = (np.random.RandomState(2).rand(3, 500) < .05).astype(int)
+    signals = np.random.RandomState(3).randn(2, 500)
+    id = ID(md)
+    id.addDuration(bins=spikes, bin_channels=['a', 'b', 'a'], conts=signals, cont_channels=['a', 'b'],
+                   events={'SAMPLE_ON': np.array([1., 2.5])})
+
+    path = str(tmpdir.join('session'))
+    store.save(id, path)
+    assert store.is_store(path)
+    loaded = store.load(path)
+
+    assert loaded.id == id.id and loaded.metadata == md
+    duration = loaded.durations[0]
+    np.testing.assert_array_equal(duration.bins[0].data, spikes)
+    np.testing.assert_array_equal(duration.conts[0].data, signals)
+    np.testing.assert_array_equal(duration.events['SAMPLE_ON'], [1., 2.5])
+    np.testing.assert_array_equal(np.asarray(duration.conts[0].nD_labels['2D']), np.arange(500) / FS)
+
+    # Arrays are memory-mapped unless asked otherwise
+    assert isinstance(duration.conts[0].data, np.memmap)
+    assert not isinstance(store.load(path, mmap_mode=None).durations[0].conts[0].data, np.memmap)
+
+
+def test_bin_labels_follow_rebuilt_spikes():
+    timestamps = [np.array([.5, 3.2]), np.array([1.01, 9.5, 12.])]
+    duration = Duration('test', bin_timestamps=timestamps, conts=np.full((2, 1500), 2.), metadata={'fs': FS})
+    binary = duration.bins[0]
+    assert binary.spikes.shape == (2, 1200) and len(binary.nD_labels['2D']) == 1200
+    binary.trail()
+
+    # As neo_loader does, rebuild the spikes over the length of the signals
+    binary.makeVectorsFromTimestamps(1500)
+    assert binary.spikes.shape == (2, 1500) and len(binary.nD_labels['2D']) == 1500
+    assert binary.trail().shape == (2, 1500)
+
+    epochs, _ = duration.epochs(binary, np.array([3.2, 12., 14.9]), (-.5, .5))
+    expected = np.zeros((2, 1500), dtype=int)
+    expected[[0, 0, 1, 1, 1], [50, 320, 101, 950, 1200]] = 1
+    for epoch, start in zip(epochs, [270, 1150, 1400]):
+        np.testing.assert_array_equal(epoch, expected[:, start:start + 100])
+
+    binary.makeVectorsFromTimestamps()  # Up to the last spike
+    assert binary.spikes.shape == (2, 1201) and len(binary.nD_labels['2D']) == 1201
+
+
+def test_time_axis_matches_materialized_labels():
+    axis = TimeAxis(1.5, 30., 100)
+    labels = np.asarray(axis)
+    np.testing.assert_allclose(labels, 1.5 + np.arange(100) / 30.)
+
+    assert axis[0] == labels[0] and axis[-1] == labels[-1]
+    np.testing.assert_array_equal(axis[[3, -2, 50]], labels[[3, -2, 50]])
+    np.testing.assert_array_equal(axis[labels > 3.], labels[labels > 3.])
+    np.testing.assert_allclose(np.asarray(axis[10:50:3]), labels[10:50:3])
+    np.testing.assert_array_equal(axis[::-1], labels[::-1])
+    with pytest.raises(IndexError):
+        axis[100]
+
+    values = np.concatenate((labels[::7], labels[::5] + .01, [-1., 1.5, 100.], [axis.stop]))
+    for side in ['left', 'right']:
+        np.testing.assert_array_equal(axis.searchsorted(values, side=side),
+                                      np.searchsorted(labels, values, side=side))
+
+    # Pickles keep the three parameters only
+    restored = pickle.loads(pickle.dumps(axis))
+    assert (restored.start, restored.fs, len(restored)) == (1.5, 30., 100)
+    assert len(TimeAxis()) == 0 and len(np.asarray(TimeAxis())) == 0
+
+
+def test_channel_index_matches_labels():
+    labels = np.array(['b', 'a', 'c', 'a', 'b', 'a'])
+    index = ChannelIndex(labels)
+
+    np.testing.assert_array_equal(index.streams, ['a', 'b', 'c'])
+    for stream in index.streams:
+        np.testing.assert_array_equal(index.sources(stream), np.flatnonzero(labels == stream))
+    np.testing.assert_array_equal(index.streams[index.inverse], labels)
+
+    np.testing.assert_array_equal(index.locate(['c', 'x', 'a']), [2, -1, 0])
+    np.testing.assert_array_equal(index.count(['a', 'x', 'b']), [3, 0, 2])
+    np.testing.assert_array_equal(index.select(['c', 'x', 'b']), [2, 0, 4])
+    assert len(index.sources('x')) == 0 and len(index.select(['x'])) == 0
+    assert 'a' in index and 'x' not in index
+
+
+def test_store_round_trip_without_conts(tmpdir):
+    md = {'name': 'spikes-only', 'project': 'RAM', 'fs': FS}
+    spikes = (np.random.RandomState(4).rand(3, 200) < .05).astype(int)
+    id = ID(md)
+    id.addDuration(bins=spikes, bin_channels=['a', 'b', 'a'])
+    assert not hasattr(id.durations[0].conts[0], 'nD_labels')  # Empty Cont
+
+    path = str(tmpdir.join('spikes-only'))
+    store.save(id, path)
+    binary = store.load(path).durations[0].bins[0]
+    np.testing.assert_array_equal(binary.data, spikes)
+    np.testing.assert_array_equal(binary.channel_index.sources('a'), [0, 2])
+    np.testing.assert_array_equal(binary.channel_index.sources('b'), [1])
+
+
+def test_ingest_finds_sessions_and_reports_failures(monkeypatch, tmpdir):
+    from data import ingest
+    base = {'name': 'base', 'extensions': {'signals': '.ns3', 'events': '.nex'}, 'fs': 2000}
+    for name, extensions in [('s2', ['.ns3', '.nex']), ('s1', ['.ns3', '.nex']), ('partial', ['.ns3'])]:
+        for extension in extensions:
+            tmpdir.join('data', name, name + extension).ensure()
+
+    # Directories only hold complete sessions, in name order
+    mds = ingest.sessions(str(tmpdir.join('data')), base=base)
+    assert [md['name'] for md in mds] == ['s1', 's2']
+
+    manifest = tmpdir.join('sessions.json')
+    manifest.write(json.dumps(['s1', {'name': 's3', 'fs': 1000}]))
+    mds = ingest.sessions(str(manifest), base=base)
+    assert [(md['name'], md['fs']) for md in mds] == [('s1', 2000), ('s3', 1000)]
+    assert base['name'] == 'base'
+
+    def load(md, **kwargs):
+        if md['name'] == 's3':
+            raise IOError('missing file')
+        return {'load': 0.}
+    monkeypatch.setattr(ingest, 'ingest', load)
+    results = ingest.run(mds, workers=1, dir=str(tmpdir.join('data')))
+    assert [result['name'] for result in results] == ['s1', 's3']
+    assert results[0]['stages'] == {'load': 0.}
+    assert results[1]['error'] == 'OSError: missing file'
+
+    out = str(tmpdir.join('ingest.json'))
+    assert ingest.main([str(manifest), '--workers', '1', '--out', out]) == 1  # A session failed
+    with open(out) as f:
+        assert [session['name'] for session in json.load(f)['sessions']] == ['s1', 's3']
+
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""Tests for engram.episodic."""
+import itertools
+import math
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from data.generate_metadata import metadata
+from engram.declarative import Bin
+from engram.episodic import envs
+from engram.episodic.edges import SparseEdges
+from engram.episodic.render import FrameWriter
+from engram.episodic.gui.engraphy.inputs import KeyboardInput, ReplayInput, SyntheticInput
+
+
+class _FailingVideo(object):
+    """imageio writer that fails when it is finalized."""
+
+    def __init__(self):
+        self.frames = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        raise IOError('ffmpeg failed')
+
+    def append_data(self, img):
+        self.frames.append(img)
+
+
+def test_frame_writer_reports_finalize_error(monkeypatch, tmpdir):
+    video = _FailingVideo()
+    imageio = types.ModuleType('imageio')
+    imageio.get_writer = lambda path, fps: video
+    monkeypatch.setitem(sys.modules, 'imageio', imageio)
+
+    writer = FrameWriter(str(tmpdir.join('movie.mp4')))
+    writer.start()
+    for _ in range(3):
+        writer.put(np.zeros((4, 4, 4), dtype=np.uint8))
+
+    errors = []
+
+    def close():
+        try:
+            writer.close()
+        except IOError as e:
+            errors.append(e)
+
+    closer = threading.Thread(target=close, daemon=True)
+    closer.start()
+    closer.join(timeout=5.)
+    assert not closer.is_alive(), 'close() hangs after a failed finalize'
+    assert len(errors) == 1
+    assert len(video.frames) == 3
+
+
+def test_input_close_stops_reader_and_flushes_record(tmpdir):
+    path = str(tmpdir.join('session.txt'))
+    controller = SyntheticInput(rate=500., commands=['EQ'], command_rate=100.,
+                                record=path, seed=0)
+    controller.start()
+    controller.push('POWER', 10.)
+    controller.close()
+    assert not controller.is_alive()
+    controller.close()  # Closing twice is harmless
+
+    replay = ReplayInput(path, speed=0.)
+    replay.start()
+    replay.join(timeout=5.)
+    _, commands = replay.poll()
+    assert 'POWER' in commands
+
+
+def test_input_poll_only_returns_new_distances():
+    controller = KeyboardInput()
+    assert controller.poll() == (None, [])
+    controller.push('EQ', 30.)
+    controller.push('NONE', 42.)
+    assert controller.poll() == (42., ['EQ'])
+    assert controller.poll() == (None, [])
+
+
+def test_sparse_edges_match_dense_baseline():
+    rng = np.random.RandomState(0)
+    activity = rng.rand(6, 40) * (rng.rand(6, 40) < .4)
+    activity[:, 5] = 0  # Silent timepoint
+    activity[:, 6] = 1.  # Every source active
+    edges = SparseEdges.from_activity(activity)
+    assert edges.shape == (6, 6, 40)
+
+    for t in range(activity.shape[1]):
+        active = activity[:, t] > 0
+        expected = activity[:, t][:, None] + activity[:, t][None, :]
+        mask = ~np.triu(active[:, None] & active[None, :], 1)
+        dense = edges[:, :, t]
+        np.testing.assert_array_equal(dense.mask, mask)
+        np.testing.assert_allclose(dense.data[~mask], expected[~mask].astype(np.float32))
+        assert len(edges.at(t)[0]) == np.count_nonzero(~mask)
+
+
+def _intersection_matrices(N=48, C=16):
+    md = metadata(N, C)
+    binary = Bin('test', data=np.zeros((N, 10), dtype=int), channel_labels=np.arange(N) % C, metadata=md)
+    return envs.carousel_metadata(md, binary)
+
+
+
+
+def _carousel_metadata_baseline(md, binary):
+    """The loop over streams that carousel_metadata replaced."""
+    lookup, indices, streams, sources, positions = [], [], [], [], []
+    n_sources = 0
+    for k, hierarchy in enumerate(md['stream_pattern']['hierarchy']):
+        if '' in hierarchy:
+            continue
+        row = []
+        for level, value in enumerate(hierarchy):
+            if len(lookup) <= level:
+                lookup.append([])
+            if value not in lookup[level]:
+                lookup[level].append(value)
+            row.append(lookup[level].index(value))
+        count = np.sum(binary.nD_labels['1D'] == md['all_streams'][k])
+        indices.append(row)
+        streams.append(md['all_streams'][k])
+        sources.append(n_sources + np.arange(count))
+        positions.append(md['stream_pattern']['positions'][k])
+        n_sources += count
+    return {'indices': np.array(indices), 'streams': np.array(streams), 'sources': np.array(sources),
+            'positions': np.array(positions), 'hierarchy_lookup': lookup}
+
+
+def test_carousel_metadata_matches_baseline():
+    rng = np.random.RandomState(0)
+    for N, C, shuffle, empty in [(48, 16, False, None), (48, 16, True, None), (64, 8, True, 3)]:
+        md = metadata(N, C)
+        if shuffle:
+            md['stream_pattern'] = md['stream_pattern'][rng.permutation(C)]
+        if empty is not None:
+            md['stream_pattern']['hierarchy'][empty, 1] = ''
+        binary = Bin('test', data=np.zeros((N, 10), dtype=int), channel_labels=np.arange(N) % C, metadata=md)
+
+        intersection_matrices = envs.carousel_metadata(md, binary)
+        expected = _carousel_metadata_baseline(md, binary)
+        assert intersection_matrices['hierarchy_lookup'] == expected['hierarchy_lookup']
+        for key in ['indices', 'streams', 'sources', 'positions']:
+            np.testing.assert_array_equal(intersection_matrices[key], expected[key])
+        assert len(intersection_matrices['streams']) == C - (empty is not None)
+
+
+def _position_slicer_baseline(intersection_matrices, method, ignore_streams):
+    """The loop over groups and streams that position_slicer replaced."""
+    indices = np.copy(intersection_matrices['indices'])
+    positions = np.asarray(intersection_matrices['positions'])
+    sources = np.asarray(intersection_matrices['sources'])
+
+    dims = np.arange(indices.shape[1])
+    method = np.asarray(method)
+    # Older numpy compared lengths that do not broadcast as a scalar True,
+    # which merged the first level only
+    dissim = dims != method if method.size in (1, len(dims)) else np.array([True])
+    indices[:, np.where(dissim)[0]] = 0
+    groups, streams_in_groups = np.unique(indices, axis=0, return_inverse=True)
+    streams_in_groups = np.ravel(streams_in_groups)
+
+    X, Y, Z = [], [], []
+    for group, properties in enumerate(groups):
+        group_pos = np.mean(positions[streams_in_groups == group], axis=0).astype(float)
+        streams = np.flatnonzero(np.all(indices == properties, axis=1))
+        per_stream = [np.arange(sources[streams].size)] if ignore_streams else sources[streams]
+        for stream, source_inds in enumerate(per_stream):
+            source_inds = source_inds - source_inds[0]
+            side = math.ceil((len(source_inds) - 1) ** .5)
+            with np.errstate(divide='ignore'):
+                side_1 = source_inds // side - (side - 1) / 2
+                side_2 = source_inds % side - (side - 1) / 2
+            flat = np.zeros(len(source_inds))
+            if ignore_streams:
+                X.append(group_pos[0] + side_1)
+                Y.append(group_pos[1] + flat)
+                Z.append(group_pos[2] + side_2)
+            else:
+                X.append(group_pos[0] + flat + stream)
+                Y.append(group_pos[1] + side_1)
+                Z.append(group_pos[2] + side_2)
+    xyz = np.c_[np.concatenate(X), np.concatenate(Y), np.concatenate(Z)]
+
+    if np.any(dissim):
+        for axis in range(3):
+            values = xyz[:, axis]
+            xyz[:, axis] = 100 * ((values - values.min()) / (values.max() - values.min()) - .5) \
+                if len(np.unique(values)) > 1 else 0
+    return xyz.astype(np.float32)
+
+
+def test_position_slicer_matches_baseline():
+    methods = [[-1], [0], [1], [2], [0, 1], [0, 2], [1, 2], [0, 1, 2]]
+    for N, C in [(48, 16), (16, 16), (64, 8)]:
+        intersection_matrices = _intersection_matrices(N, C)
+        for method, ignore_streams in itertools.product(methods, [True, False]):
+            xyz = envs.position_slicer(intersection_matrices, method=np.asarray(method),
+                                       ignore_streams=ignore_streams)
+            assert xyz.shape == (N, 3) and xyz.dtype == np.float32
+            np.testing.assert_array_equal(xyz, _position_slicer_baseline(
+                intersection_matrices, method, ignore_streams))
+
+
+class _Target(object):
+    """Source or connectivity object that records its target positions."""
+
+    def _update_target_position(self, xyz=None, nodes=None):
+        self.xyz = xyz if nodes is None else nodes
+
+
+def test_carousel_layouts_are_computed_once(monkeypatch):
+    engram = pytest.importorskip('engram.episodic.gui.engraphy.engram')
+    intersection_matrices = _intersection_matrices()
+    calls = []
+
+    def position_slicer(*args, **kwargs):
+        calls.append(kwargs)
+        return envs.position_slicer(*args, **kwargs)
+    monkeypatch.setattr(engram, 'position_slicer', position_slicer)
+
+    # None, every level alone, every pair of levels and every level
+    options = [[np.array([0])], [np.array([1]), np.array([2]), np.array([3])],
+               [np.array([1, 2]), np.array([1, 3]), np.array([2, 3])], [np.array([1, 2, 3])]]
+    view = types.SimpleNamespace(carousel_metadata=intersection_matrices, _carousel_options_inds=options,
+                                 _ignores_streams=engram.Engram._ignores_streams,
+                                 sources=[_Target()], connect=[_Target()])
+    engram.Engram._cache_layouts(view)
+    assert len(calls) == 8
+
+    for n_choices, level in enumerate(options):
+        for which_choice, option in enumerate(level):
+            view._carousel_choice = [n_choices, which_choice]
+            engram.Engram.update_target_positions(view)
+            expected = envs.position_slicer(intersection_matrices, method=option - 1,
+                                            ignore_streams=n_choices not in (2, 3))
+            np.testing.assert_array_equal(view.sources[0].xyz, expected)
+            np.testing.assert_array_equal(view.connect[0].xyz, expected)
+            # Objects ease in place, so none of them holds the cached layout
+            assert view.sources[0].xyz is not view.connect[0].xyz
+    assert len(calls) == 8
+
+
+def test_windowed_radii_match_global_normalize():
+    pytest.importorskip('visbrain')
+    from engram.episodic.objects import source_obj
+    data = np.random.RandomState(0).rand(5, 100) * 3.
+    expected = source_obj.normalize(data.astype(np.float32), tomin=1., tomax=25.)
+
+    source = types.SimpleNamespace(_data=data, _radius_min=1., _radius_max=25., _radius_window=16)
+    source._scale_radius = types.MethodType(source_obj.SourceObj._scale_radius, source)
+    # Forward and backward playback, and jumps
+    for timepoints in [range(100), range(99, -1, -1), [5, 70, 3, 99, 40, 41]]:
+        source._radius_start = None
+        for timepoint in timepoints:
+            np.testing.assert_allclose(source_obj.SourceObj._radius_at(source, timepoint),
+                                       expected[:, timepoint], rtol=1e-6)
+            assert source._radius_chunk.shape[1] <= 16
+
+    constant = types.SimpleNamespace(_data=np.full((5, 100), 2.), _radius_min=1., _radius_max=25.)
+    np.testing.assert_array_equal(source_obj.SourceObj._scale_radius(constant, constant._data[:, :16]),
+                                  np.ones((5, 16)))
+
+
+def test_read_template_logs_failures(monkeypatch, tmpdir, caplog):
+    io = types.ModuleType('visbrain.io')
+    io.download_file = lambda filename, astype: str(tmpdir.join(filename))
+    monkeypatch.setitem(sys.modules, 'visbrain.io', io)
+
+    np.savez(str(tmpdir.join('good.npz')), vertices=np.arange(3))
+    tmpdir.join('broken.npz').write('not an archive')
+    with caplog.at_level('ERROR', logger='visbrain'):
+        envs.read_template('good')
+        assert not caplog.records
+        envs.read_template('broken')
+        envs.read_template('missing')
+    assert [record.levelname for record in caplog.records] == ['ERROR', 'ERROR']
+    assert 'broken' in caplog.records[0].getMessage() and 'missing' in caplog.records[1].getMessage()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Tests for engram.procedural."""
+import numpy as np
+import pytest
+from scipy.signal import sosfilt, sosfiltfilt
+
+from engram.procedural import cache, events, filters
+
+
+def test_settling_samples_bound_the_impulse_response():
+    sos = filters.butter_sos('high', 1., 2000., order=5)
+    n = filters.settling_samples(sos)
+    h = np.abs(sosfilt(sos, np.eye(1, 2 * n)[0]))
+    assert h[n:].max() <= 1e-9 * h.max() < h[n - 1]
+
+
+def test_chunked_filter_matches_unchunked():
+    rng = np.random.RandomState(0)
+    data = np.cumsum(rng.randn(3, 40000), axis=-1)  # Slow drifts ring longest
+    for btype, cutoff in [('high', 1.), ('band', (1., 40.))]:
+        sos = filters.butter_sos(btype, cutoff, 2000., order=5)
+        expected = sosfiltfilt(sos, data, axis=-1)
+        np.testing.assert_array_equal(filters.sos_filter(sos, data), expected)
+        chunked = filters.sos_filter(sos, data, chunk=3000)
+        np.testing.assert_allclose(chunked, expected, rtol=0, atol=1e-6 * np.abs(data).max())
+
+    # Single channels and the bandpass entry point chunk the same way
+    np.testing.assert_allclose(filters.select('bandpass', data[0], min=1., max=40., fs=2000., chunk=7000),
+                               filters.select('bandpass', data[0], min=1., max=40., fs=2000.),
+                               rtol=0, atol=1e-6 * np.abs(data).max())
+
+
+def test_cache_load_reuses_entries_until_the_file_changes(tmpdir):
+    source = tmpdir.join('recording.bin')
+    source.write('abc')
+    cache_dir = str(tmpdir.join('cache'))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'values': np.arange(len(calls) + 2)}
+
+    first = cache.load(str(source), 'tag', compute, cache_dir=cache_dir)
+    second = cache.load(str(source), 'tag', compute, cache_dir=cache_dir)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(second['values'], first['values'])
+
+    cache.load(str(source), 'other', compute, cache_dir=cache_dir)
+    assert len(calls) == 2
+
+    source.write('abcdef')  # Changing the file invalidates its entries
+    cache.load(str(source), 'tag', compute, cache_dir=cache_dir)
+    assert len(calls) == 3
+
+    cache.clear(cache_dir)
+    cache.load(str(source), 'tag', compute, cache_dir=cache_dir)
+    assert len(calls) == 4
+
+    # Missing files are never cached
+    cache.load(str(tmpdir.join('missing.bin')), 'tag', compute, cache_dir=cache_dir)
+    cache.load(str(tmpdir.join('missing.bin')), 'tag', compute, cache_dir=cache_dir)
+    assert len(calls) == 6
+
+
+def test_pack_round_trip():
+    series = {'ITI_ON': np.array([1., 2.]), 'EMPTY': np.array([]), 3: np.array([.5])}
+    unpacked = cache.unpack('events', cache.pack('events', series))
+    assert sorted(unpacked) == ['3', 'EMPTY', 'ITI_ON']
+    for name, values in series.items():
+        np.testing.assert_array_equal(unpacked[str(name)], values)
+    assert cache.unpack('events', cache.pack('events', {})) == {}
+
+
+class _Reader(object):
+    """Minimal neo rawio reader with timestamps in milliseconds."""
+
+    def __init__(self, channels):
+        self.header = {'event_channels': [(name,) for name in channels]}
+        self.stamps = {ii: np.arange(ii + 1, dtype=np.int64) * 1000 for ii in range(len(channels))}
+
+    def parse_header(self):
+        pass
+
+    def get_event_timestamps(self, block_index, seg_index, event_channel_index, t_start, t_stop):
+        return self.stamps[event_channel_index], None, None
+
+    def rescale_event_timestamp(self, stamps, dtype):
+        return stamps.astype(dtype) / 1000.
+
+
+def test_events_load_caches_decoded_events(monkeypatch, tmpdir):
+    import neo
+    opened = []
+
+    def get_io(filename):
+        opened.append(filename)
+        return _Reader(['DIO_00008', 'sig002_nr'])
+    monkeypatch.setattr(neo, 'get_io', get_io, raising=False)
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmpdir.join('cache')))
+    filename = tmpdir.join('session.nex')
+    filename.write('')
+
+    for _ in range(2):
+        decoded, neurons = events.load('RAM', str(filename))
+        np.testing.assert_array_equal(decoded['SAMPLE_ON'], [0.])
+        np.testing.assert_array_equal(neurons['sig002_nr'], [0., 1.])
+    assert len(opened) == 1
+
+    events.load('RAM', str(filename), cache=False)
+    assert len(opened) == 2
+
+
+def test_event_table_decodes_channels():
+    channels = ['DIO_65533', 'sig001_nr', 'DIO_00008', 'custom', 'DIO_65527 DIO_00004']
+    decoded, neurons = events.RAM(_Reader(channels))
+
+    assert sorted(decoded) == ['DIO_CHANGED', 'SAMPLE_ON', 'custom']
+    np.testing.assert_array_equal(decoded['DIO_CHANGED'], [0.])
+    np.testing.assert_array_equal(decoded['custom'], [0., 1., 2., 3.])
+    np.testing.assert_array_equal(neurons['sig001_nr'], [0., 1.])
+    # Later codes take precedence when a channel holds several
+    assert events.RAM.names(['DIO_65527 DIO_00004']) == ['SAMPLE_ON']
+
+
+def test_select_unknown_project():
+    with pytest.raises(ValueError):
+        events.select('Unknown', _Reader([]))
+
+
+def test_event_names_are_decoded_once_per_channel():
+    table = events.EventTable('test', {'DIO_1': 'ON', 'DIO_12': 'OFF'})
+    assert table.names([]) == []
+    decoded = []
+    decode = table._decode
+    table._decode = lambda channel: decoded.append(channel) or decode(channel)
+
+    channels = ['x DIO_12', 'DIO_1', 'sig001_nr', 'x DIO_12', 'other', 'DIO_12']
+    assert table.names(channels) == ['OFF', 'ON', None, 'OFF', 'other', 'OFF']
+    assert sorted(decoded) == ['other', 'sig001_nr', 'x DIO_12']  # Codes are in the table
+    assert table.names(channels[::-1]) == ['OFF', 'other', 'OFF', None, 'ON', 'OFF']
+    assert len(decoded) == 3
+
@@ -37,7 +37,7 @@ else:
     
     else: 
 
-        id = neo_loader(md, 'data')
+        id = neo_loader(md, 'data', lazy=True)
 
 
 id.episode(shader='separation', control_method='keyboard') # control_method='IR_Distance')
\ No newline at end of file